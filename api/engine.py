@@ -0,0 +1,892 @@
+from fastapi import HTTPException
+from pydantic import ValidationError, create_model
+import sqlite3
+import pandas as pd
+import pyarrow.parquet as pq
+import os
+import queue
+import threading
+import time
+import inspect
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+from typing import List, Optional
+import logging
+import logging.handlers
+import json
+import re
+import hashlib
+
+from sas_schema import catalog_from_json, value_labels
+from api.metrics import count, timed
+from api.numpy_engine import (
+    ArrayStore, DIMENSION_COLUMNS, EARNINGS_COLUMN, ENGINE_COLUMNS, WEIGHT_COLUMN, replicate_columns
+)
+
+# The API's query logic, importable without the web app: api/main.py serves these
+# functions over HTTP and the dashboard calls them in-process when NSSRN_EMBEDDED=1.
+# Errors are raised as HTTPException so the API can return them unchanged; in-process
+# callers read their status_code and detail.
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(BASE_DIR, "nursing.db")
+PARQUET_PATH = os.path.join(BASE_DIR, "nursing.parquet")
+
+# agg_cube state key for national totals (built by etl.py)
+NATIONAL = "ALL"
+
+# "sql" answers from agg_cube in nursing.db, "numpy" from in-memory arrays (api/numpy_engine.py)
+ENGINE = os.environ.get("NSSRN_ENGINE", "sql")
+
+# Read-only connection pool settings
+DB_POOL_SIZE = int(os.environ.get("NSSRN_DB_POOL_SIZE", 8))
+DB_MMAP_SIZE = 256 * 1024 * 1024
+DB_CACHE_KIB = 64 * 1024
+# Compiled statements kept per connection; each query shape has one fixed SQL text
+DB_STATEMENT_CACHE = 256
+# Seconds a read waits on the ETL's write lock before failing with "database is locked"
+DB_BUSY_TIMEOUT = float(os.environ.get("NSSRN_DB_BUSY_TIMEOUT", 30))
+
+class ConnectionPool:
+    """
+    Long-lived read-only SQLite connections shared by the request threads.
+    Connections are opened in read-only URI mode with memory-mapped I/O and a large page
+    cache. etl.py rewrites nursing.db in place, so they keep SQLite's file locking: reads
+    wait for the ETL's transactions and always see a consistent database. A connection
+    would keep reading a file that was deleted and recreated, so the pool also watches
+    the file's inode and retires every connection when the file is replaced.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._generation = 0
+        self._identity = None
+
+    def _open(self, path: str):
+        conn = sqlite3.connect(
+            f"file:{path}?mode=ro", uri=True, check_same_thread=False,
+            timeout=DB_BUSY_TIMEOUT, cached_statements=DB_STATEMENT_CACHE
+        )
+        conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size = -{DB_CACHE_KIB}")
+        return conn
+
+    def _check_identity(self, path: str):
+        stat = os.stat(path)
+        identity = (path, stat.st_dev, stat.st_ino)
+        with self._lock:
+            if identity == self._identity:
+                return
+            logger.info(f"Database file replaced, reopening connections to {path}")
+            self._identity = identity
+            self._generation += 1
+            while True:
+                try:
+                    _, conn = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
+                self._created -= 1
+
+    def _checkout(self, path: str):
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                if self._created < self.size:
+                    self._created += 1
+                    generation = self._generation
+                    break
+            # Every connection is busy: wait for one to come back
+            try:
+                return self._idle.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        try:
+            return generation, self._open(path)
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    @contextmanager
+    def connection(self, path: str):
+        self._check_identity(path)
+        generation, conn = self._checkout(path)
+        try:
+            yield conn
+        finally:
+            with self._lock:
+                current = generation == self._generation
+                if not current:
+                    self._created -= 1
+            if current:
+                self._idle.put((generation, conn))
+            else:
+                conn.close()
+
+db_pool = ConnectionPool(DB_POOL_SIZE)
+
+# Slow-query log: statements slower than the threshold are written, with their
+# EXPLAIN QUERY PLAN, to a rotating JSONL file and summarized by /admin/slow_queries
+SLOW_QUERY_MS = float(os.environ.get("NSSRN_SLOW_QUERY_MS", 100))
+SLOW_QUERY_LOG = os.environ.get("NSSRN_SLOW_QUERY_LOG", os.path.join(BASE_DIR, "logs", "slow_queries.jsonl"))
+SLOW_QUERY_LOG_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 5
+
+class SlowQueryLog:
+    """
+    Records statements slower than threshold_ms: one JSON line per occurrence in a
+    rotating log file, plus per-shape totals in memory. Queries are parameterized, so
+    the SQL text with whitespace collapsed identifies the shape.
+    """
+
+    def __init__(self, path: str, threshold_ms: float):
+        self.path = path
+        self.threshold_ms = threshold_ms
+        self._shapes = {}
+        self._lock = threading.Lock()
+        self._logger = None
+
+    def _file_logger(self):
+        if self._logger is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                self.path, maxBytes=SLOW_QUERY_LOG_BYTES, backupCount=SLOW_QUERY_LOG_BACKUPS
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            file_logger = logging.getLogger("nssrn.slow_queries")
+            file_logger.addHandler(handler)
+            file_logger.setLevel(logging.INFO)
+            file_logger.propagate = False
+            self._logger = file_logger
+        return self._logger
+
+    def record(self, conn, query: str, params: tuple, seconds: float):
+        milliseconds = seconds * 1000
+        if milliseconds < self.threshold_ms:
+            return
+        shape = re.sub(r"\s+", " ", query).strip()
+        try:
+            plan = [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+        except sqlite3.Error as e:
+            plan = [f"EXPLAIN failed: {e}"]
+        # A SCAN without an index reads every row of the table
+        full_scan = any(step.startswith("SCAN") and "INDEX" not in step for step in plan)
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "ms": round(milliseconds, 3),
+            "sql": shape,
+            "params": list(params),
+            "plan": plan,
+            "full_scan": full_scan
+        }
+        logger.warning(f"Slow query ({milliseconds:.1f} ms): {shape} {params}")
+        try:
+            self._file_logger().info(json.dumps(entry, default=str))
+        except OSError as e:
+            logger.error(f"Could not write the slow-query log: {e}")
+
+        with self._lock:
+            stats = self._shapes.setdefault(shape, {"sql": shape, "count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            stats["count"] += 1
+            stats["total_ms"] += milliseconds
+            if milliseconds >= stats["max_ms"]:
+                stats.update(max_ms=milliseconds, params=list(params), plan=plan, full_scan=full_scan)
+
+    def slowest(self, limit: int):
+        """The limit shapes with the highest maximum time."""
+        with self._lock:
+            shapes = [dict(stats) for stats in self._shapes.values()]
+        for stats in shapes:
+            stats["mean_ms"] = stats["total_ms"] / stats["count"]
+        return sorted(shapes, key=lambda stats: stats["max_ms"], reverse=True)[:limit]
+
+slow_queries = SlowQueryLog(SLOW_QUERY_LOG, SLOW_QUERY_MS)
+
+def get_data(query: str, params: tuple = ()):
+    try:
+        with db_pool.connection(DB_PATH) as conn:
+            logger.info(f"Executing query: {query} {params}")
+            start = time.perf_counter()
+            with timed("sql"):
+                df = pd.read_sql_query(query, conn, params=params)
+            slow_queries.record(conn, query, params, time.perf_counter() - start)
+            count("sql_queries")
+            count("sql_rows", len(df))
+            return df
+    except Exception as e:
+        logger.error(f"Database error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def get_columns(columns: List[str], state: Optional[str] = None):
+    """Reads only the given columns from the columnar store, skipping other states' row groups."""
+    filters = [("STATE_PUF", "==", state)] if state else None
+    try:
+        logger.info(f"Reading columns {columns} (state={state})")
+        with timed("parquet"):
+            table = pq.read_table(PARQUET_PATH, columns=columns, filters=filters)
+            return table.to_pandas()
+    except Exception as e:
+        logger.error(f"Columnar store error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+_dataset = {"identity": None, "version": None}
+_dataset_lock = threading.Lock()
+
+# etl_metadata keys behind the served results: the loaded data and every derived artifact
+DATASET_VERSION_KEYS = ("dataset_version", "analytics_signature", "cube_signature", "parquet_signature")
+
+def dataset_version() -> str:
+    """
+    Version stamp of the served data: a hash of the etl_metadata dataset version and the
+    signatures of the derived artifacts (analytics, agg_cube, Parquet), so rebuilding any
+    of them changes it. Re-read only when the database file's inode, size or mtime changes.
+    Databases built before the ETL recorded metadata fall back to the file identity.
+    """
+    stat = os.stat(DB_PATH)
+    identity = (DB_PATH, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    with _dataset_lock:
+        if identity == _dataset["identity"]:
+            return _dataset["version"]
+    placeholders = ", ".join("?" for _ in DATASET_VERSION_KEYS)
+    try:
+        rows = get_data(f"SELECT key, value FROM etl_metadata WHERE key IN ({placeholders})", DATASET_VERSION_KEYS)
+        metadata = dict(zip(rows['key'], rows['value']))
+    except HTTPException:
+        metadata = {}
+    if "dataset_version" in metadata:
+        parts = tuple(metadata.get(key) for key in DATASET_VERSION_KEYS)
+        version = hashlib.sha256(repr(parts).encode()).hexdigest()[:16]
+    else:
+        version = f"{stat.st_ino}-{stat.st_size}-{stat.st_mtime_ns}"
+    with _dataset_lock:
+        _dataset.update(identity=identity, version=version)
+    return version
+
+# Endpoint result cache settings
+CACHE_MAX_ENTRIES = int(os.environ.get("NSSRN_CACHE_SIZE", 4096))
+CACHE_TTL_SECONDS = float(os.environ.get("NSSRN_CACHE_TTL", 3600))
+
+class ResultCache:
+    """
+    LRU cache of endpoint results with a TTL. Entries belong to one dataset version;
+    the whole cache is dropped as soon as dataset_version() changes.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _sync_version(self):
+        version = dataset_version()
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+
+    def get_or_compute(self, key, compute):
+        self._sync_version()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                count("cache_hits")
+                return entry[1]
+            self.misses += 1
+        count("cache_misses")
+
+        value = compute()
+        with self._lock:
+            self._entries[key] = (now + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "dataset_version": self._version,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+result_cache = ResultCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+
+def call_key(func, signature, args, kwargs):
+    """(name, arguments with defaults applied) identifying one call of func."""
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    # Repeated query parameters arrive as lists
+    arguments = tuple((name, tuple(value) if isinstance(value, list) else value) for name, value in bound.arguments.items())
+    return (func.__name__, arguments)
+
+def cached(func):
+    """Caches an endpoint's result keyed by its name and its arguments with defaults applied."""
+    signature = inspect.signature(func)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        key = call_key(func, signature, args, kwargs)
+        return result_cache.get_or_compute(key, lambda: func(*args, **kwargs))
+
+    return wrapper
+
+def run_route(func, **kwargs):
+    """Calls a route function, recording its time and result size for /metrics."""
+    with timed("handler"):
+        result = func(**kwargs)
+    if isinstance(result, list):
+        count("response_rows", len(result))
+    return result
+
+_engine = {"version": None, "store": None}
+_engine_lock = threading.Lock()
+
+def get_engine() -> ArrayStore:
+    """
+    The in-memory ArrayStore for the current dataset version, (re)loaded when it changes.
+    It also holds the replicate weights, which the with_se=true standard errors need.
+    """
+    version = dataset_version()
+    with _engine_lock:
+        if _engine["version"] != version:
+            names = [var['name'] for var in get_catalog()['variables']]
+            columns = ENGINE_COLUMNS + replicate_columns(names)
+            if os.path.exists(PARQUET_PATH):
+                frame = get_columns(columns)
+            else:
+                frame = get_data(f"SELECT {', '.join(columns)} FROM nssrn")
+            logger.info(f"Loaded {len(frame)} rows into the numpy engine")
+            _engine.update(version=version, store=ArrayStore(frame))
+        return _engine["store"]
+
+def add_standard_errors(df: pd.DataFrame, errors: pd.DataFrame, names: dict):
+    """
+    Joins replicate-weight standard errors from the numpy engine onto an endpoint's rows.
+    names maps the engine's key columns to the endpoint's column names.
+    """
+    errors = errors.rename(columns=names)
+    return df.merge(errors, on=list(names.values()), how="left")
+
+def get_replicate_engine() -> ArrayStore:
+    store = get_engine()
+    if not store.replicate_names:
+        raise HTTPException(status_code=400, detail="Standard errors need the RKRNWGT1..RKRNWGT80 replicate weights")
+    return store
+
+@cached
+def get_catalog():
+    """Loads the SAS catalog etl.py stored in nursing.db, once per dataset version."""
+    df = get_data("SELECT catalog FROM schema_catalog")
+    return catalog_from_json(df['catalog'].iloc[0])
+
+@cached
+def filter_options():
+    # Only two columns are needed, so prefer the columnar store when the ETL wrote one
+    if os.path.exists(PARQUET_PATH):
+        df = get_columns(["STATE_PUF", "PN_EMPSIT"])
+        return {
+            "states": sorted(df['STATE_PUF'].dropna().unique().tolist()),
+            "work_settings": sorted(df['PN_EMPSIT'].dropna().unique().tolist())
+        }
+
+    # Using STATE_PUF for state
+    states_query = "SELECT DISTINCT STATE_PUF FROM analytics ORDER BY STATE_PUF"
+    settings_query = "SELECT DISTINCT PN_EMPSIT FROM analytics ORDER BY PN_EMPSIT" 
+    
+    states = get_data(states_query)['STATE_PUF'].dropna().tolist()
+    settings = get_data(settings_query)['PN_EMPSIT'].dropna().tolist()
+    return {
+        "states": states,
+        "work_settings": settings
+    }
+
+@cached
+def catalog_labels():
+    """Variables, variable labels and value labels ([code, label] pairs) from the SAS program"""
+    catalog = get_catalog()
+    return {
+        "variables": catalog['variables'],
+        "labels": catalog['labels'],
+        "value_labels": {
+            name: [[code, label] for code, label in value_labels(catalog, name).items()]
+            for name in catalog['value_formats']
+        }
+    }
+
+# Weighted crosstabs
+#
+# Every statistics endpoint is a crosstab: the weighted distribution of an outcome
+# variable within up to two breakdown variables, optionally restricted by equality
+# filters and with the weighted mean of a target variable. Column names are checked
+# against the SAS catalog before they reach SQL and values are always bound, so each
+# query shape has one stable SQL text that the pooled connections compile once.
+#
+# A crosstab is answered, in order of preference, by the numpy engine (NSSRN_ENGINE=numpy),
+# by agg_cube when the cube holds that pair of variables, and otherwise by a GROUP BY over
+# the microdata (the columnar store when it exists, else analytics or nssrn in SQLite).
+# with_se=true adds successive-difference replicate (SDR) standard errors, 95% confidence
+# intervals and relative standard errors, computed by the numpy engine from RKRNWGT1..80.
+
+MAX_BREAKDOWNS = 2
+
+@cached
+def get_cube_pairs():
+    """The (var_a, var_b) pairs etl.py materialized into agg_cube."""
+    try:
+        df = get_data("SELECT DISTINCT var_a, var_b FROM agg_cube")
+    except HTTPException:
+        return frozenset()
+    return frozenset(zip(df['var_a'], df['var_b']))
+
+@cached
+def get_table_columns(table: str):
+    return frozenset(get_data("SELECT name FROM pragma_table_info(?)", (table,))['name'])
+
+def parse_filter_value(var: dict, text: str):
+    """Converts a filter value from the query string to the column's type."""
+    if var['type'] == 'char':
+        return text
+    try:
+        number = float(text)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{var['name']} needs a numeric value, got {text!r}")
+    return int(number) if number.is_integer() else number
+
+def parse_filters(items: Optional[List[str]]) -> dict:
+    """{variable: value text} from repeated VARIABLE:value query parameters."""
+    filters = {}
+    for item in items or []:
+        name, sep, value = item.partition(":")
+        if not sep:
+            raise HTTPException(status_code=400, detail=f"Filters look like VARIABLE:value, got {item!r}")
+        filters[name] = value
+    return filters
+
+def crosstab_columns(outcome: str, by: List[str], filters: dict, mean_of: Optional[str]):
+    """Validates a crosstab's column names against the catalog."""
+    variables = {var['name']: var for var in get_catalog()['variables']}
+    for name in [outcome, *by, *filters, *([mean_of] if mean_of else [])]:
+        if name not in variables:
+            raise HTTPException(status_code=400, detail=f"Unknown variable: {name}")
+    if len(by) > MAX_BREAKDOWNS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BREAKDOWNS} breakdown variables")
+    if len(set([outcome, *by])) != len(by) + 1:
+        raise HTTPException(status_code=400, detail="Outcome and breakdown variables must be distinct")
+    if mean_of and variables[mean_of]['type'] != 'num':
+        raise HTTPException(status_code=400, detail=f"{mean_of} is not numeric")
+    return variables
+
+def engine_supports(keys: List[str], filters: dict, mean_of: Optional[str]) -> bool:
+    return (
+        all(name in DIMENSION_COLUMNS for name in [*keys, *filters])
+        and mean_of in (None, EARNINGS_COLUMN)
+    )
+
+def engine_crosstab(keys: List[str], state: Optional[str], filters: dict, mean_of: Optional[str]):
+    store = get_engine()
+    if mean_of:
+        return store.weighted_means(keys, state, filters)
+    return store.weighted_counts(keys, state, filters)
+
+def cube_crosstab(keys: List[str], state: Optional[str], filters: dict, mean_of: Optional[str]):
+    """
+    Reads the crosstab from agg_cube, or returns None when the cube does not hold it.
+    The cube only aggregates earnings, and each row covers one or two variables, so
+    breakdown and filter variables together must form one of its (var_a, var_b) pairs.
+    """
+    if mean_of not in (None, EARNINGS_COLUMN):
+        return None
+    variables = [name for name in dict.fromkeys([*keys, *filters]) if name != "STATE_PUF"]
+    pairs = get_cube_pairs()
+    if len(variables) == 1 and (variables[0], '') in pairs:
+        pair = (variables[0], '')
+    elif len(variables) == 2 and tuple(variables) in pairs:
+        pair = tuple(variables)
+    elif len(variables) == 2 and tuple(reversed(variables)) in pairs:
+        pair = tuple(reversed(variables))
+    else:
+        return None
+
+    positions = {pair[0]: "value_a", pair[1]: "value_b", "STATE_PUF": "state"}
+    if mean_of:
+        measures = ["earn_weight AS weighted_count", "earn_weighted_sum / earn_weight AS mean"]
+    else:
+        measures = ["weighted_count"]
+    conditions = ["var_a = ?", "var_b = ?"]
+    params = list(pair)
+    if "STATE_PUF" in keys and not state:
+        conditions.append("state != ?")
+        params.append(NATIONAL)
+    else:
+        conditions.append("state = ?")
+        params.append(state or NATIONAL)
+    for name, value in filters.items():
+        conditions.append(f"{positions[name]} = ?")
+        params.append(value)
+    if mean_of:
+        conditions.append("earn_weight > 0")
+
+    query = f"""
+        SELECT {', '.join(f"{positions[name]} AS {name}" for name in keys)}, {', '.join(measures)}
+        FROM agg_cube
+        WHERE {' AND '.join(conditions)}
+        ORDER BY {', '.join(positions[name] for name in keys)}
+    """
+    return get_data(query, tuple(params))
+
+def columnar_crosstab(keys: List[str], state: Optional[str], filters: dict, mean_of: Optional[str]):
+    """
+    The microdata GROUP BY answered from the columnar store: only the crosstab's columns
+    are read, and with a state only that state's row group.
+    """
+    columns = list(dict.fromkeys([*keys, *filters, *([mean_of] if mean_of else []), WEIGHT_COLUMN]))
+    df = get_columns(columns, state)
+    selected = df[keys].notna().all(axis=1)
+    for name, value in filters.items():
+        selected &= df[name] == value
+    if mean_of:
+        # Like the earnings endpoint, a mean covers only rows with a positive value
+        selected &= df[mean_of] > 0
+    df = df[selected]
+
+    groups = [df[name] for name in keys]
+    result = df[WEIGHT_COLUMN].groupby(groups, sort=True).sum().rename("weighted_count").to_frame()
+    if mean_of:
+        result["mean"] = (df[mean_of] * df[WEIGHT_COLUMN]).groupby(groups, sort=True).sum() / result["weighted_count"]
+    return result.reset_index()
+
+def microdata_crosstab(keys: List[str], state: Optional[str], filters: dict, mean_of: Optional[str]):
+    """
+    GROUP BY over the microdata: from the columnar store when the ETL wrote one, else
+    SQL over analytics when it has every column, else over nssrn.
+    """
+    if os.path.exists(PARQUET_PATH):
+        return columnar_crosstab(keys, state, filters, mean_of)
+
+    columns = [*keys, *filters, *([mean_of] if mean_of else []), WEIGHT_COLUMN]
+    table = "analytics" if set(columns) <= get_table_columns("analytics") else "nssrn"
+
+    measures = [f"SUM({WEIGHT_COLUMN}) AS weighted_count"]
+    conditions = [f"{name} IS NOT NULL" for name in keys]
+    params = []
+    if state:
+        conditions.append("STATE_PUF = ?")
+        params.append(state)
+    for name, value in filters.items():
+        conditions.append(f"{name} = ?")
+        params.append(value)
+    if mean_of:
+        # Like the earnings endpoint, a mean covers only rows with a positive value
+        measures.append(f"SUM({mean_of} * {WEIGHT_COLUMN}) / SUM({WEIGHT_COLUMN}) AS mean")
+        conditions.append(f"{mean_of} > 0")
+
+    query = f"""
+        SELECT {', '.join(keys)}, {', '.join(measures)}
+        FROM {table}
+        WHERE {' AND '.join(conditions)}
+        GROUP BY {', '.join(keys)}
+        ORDER BY {', '.join(keys)}
+    """
+    return get_data(query, tuple(params))
+
+def crosstab(outcome: str, by: Optional[List[str]] = None, state: Optional[str] = None,
+             filters: Optional[dict] = None, mean_of: Optional[str] = None, with_se: bool = False):
+    """
+    Weighted counts of outcome within each combination of the by variables, with the
+    outcome's percentage inside its by group. With mean_of, only rows where mean_of is
+    positive are counted and the weighted mean of mean_of is added as mean.
+    Returns one row per group: the by columns, outcome, weighted_count, [mean], percentage.
+    """
+    by = list(by or [])
+    filters = dict(filters or {})
+    variables = crosstab_columns(outcome, by, filters, mean_of)
+    if "STATE_PUF" in filters:
+        state = filters.pop("STATE_PUF")
+    filters = {name: parse_filter_value(variables[name], str(value)) for name, value in filters.items()}
+    keys = by + [outcome]
+
+    if ENGINE == "numpy" and engine_supports(keys, filters, mean_of):
+        with timed("engine"):
+            df = engine_crosstab(keys, state, filters, mean_of)
+    else:
+        df = cube_crosstab(keys, state, filters, mean_of)
+        if df is None:
+            df = microdata_crosstab(keys, state, filters, mean_of)
+
+    if by:
+        totals = df.groupby(by)['weighted_count'].transform('sum')
+    else:
+        totals = pd.Series(df['weighted_count'].sum(), index=df.index)
+    df['percentage'] = (df['weighted_count'] / totals * 100).where(totals > 0, 0)
+
+    if with_se:
+        if not engine_supports(keys, filters, mean_of):
+            raise HTTPException(status_code=400, detail=f"Standard errors are only available for {', '.join(DIMENSION_COLUMNS)}")
+        store = get_replicate_engine()
+        with timed("engine"):
+            errors = store.count_standard_errors(keys, state, filters, within=by, earners=bool(mean_of))
+            if mean_of:
+                errors = errors.merge(store.mean_standard_errors(keys, state, filters), on=keys)
+        df = add_standard_errors(df, errors, {name: name for name in keys})
+    return df
+
+def frame_records(df: pd.DataFrame) -> list:
+    """A panel's rows as dicts for the routes."""
+    # NaN (e.g. the RSE of a zero estimate) is not valid JSON
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+def crosstab_frame(outcome: str, by: Optional[List[str]] = None, state: Optional[str] = None,
+                   filter: Optional[List[str]] = None, mean_of: Optional[str] = None, with_se: bool = False):
+    """crosstab() with filters given as VARIABLE:value strings."""
+    return crosstab(outcome, by, state, parse_filters(filter), mean_of, with_se)
+
+@cached
+def crosstab_stats(outcome: str, by: Optional[List[str]] = None, state: Optional[str] = None,
+                   filter: Optional[List[str]] = None, mean_of: Optional[str] = None, with_se: bool = False):
+    """crosstab_frame() as records."""
+    return frame_records(crosstab_frame(outcome, by, state, filter, mean_of, with_se))
+
+# The panels the dashboard shows, as fixed crosstabs. Each *_frame function returns the
+# DataFrame (for the embedded dashboard); the cached *_stats function with the same
+# parameters returns it as records for the routes.
+
+def burnout_frame(state: Optional[str] = None, with_se: bool = False):
+    df = crosstab("PN_BURNOUT", state=state, with_se=with_se)
+    return df.rename(columns={"PN_BURNOUT": "category"})
+
+@cached
+def burnout_stats(state: Optional[str] = None, with_se: bool = False):
+    return frame_records(burnout_frame(state, with_se))
+
+def satisfaction_frame(state: Optional[str] = None, breakdown_by_gender: bool = False, with_se: bool = False):
+    logger.info(f"satisfaction_frame called with state={state}, breakdown_by_gender={breakdown_by_gender}")
+    # Variable: PN_SATISFD, as percentages within each gender when broken down
+    if breakdown_by_gender:
+        df = crosstab("PN_SATISFD", ["SEX"], state, with_se=with_se)
+        return df.rename(columns={"PN_SATISFD": "category", "SEX": "gender"})
+    df = crosstab("PN_SATISFD", state=state, with_se=with_se)
+    return df.rename(columns={"PN_SATISFD": "category"})
+
+@cached
+def satisfaction_stats(state: Optional[str] = None, breakdown_by_gender: bool = False, with_se: bool = False):
+    return frame_records(satisfaction_frame(state, breakdown_by_gender, with_se))
+
+EARNINGS_GROUPINGS = ["PN_EMPSIT", "AGE_GP_PUF", "HIGHEDU_PUF", "SEX"]
+
+def earnings_frame(state: Optional[str] = None, grouping: str = "PN_EMPSIT", with_se: bool = False):
+    if grouping not in EARNINGS_GROUPINGS:
+        grouping = "PN_EMPSIT"
+
+    # Averages over earners (PN_EARN_PUF > 0); their weight total is the population size
+    df = crosstab(grouping, state=state, mean_of=EARNINGS_COLUMN, with_se=with_se)
+    df = df.drop(columns=[column for column in df.columns if column.startswith("percentage")])
+    names = {grouping: "group_name"}
+    for column in df.columns:
+        if column.startswith("mean"):
+            names[column] = "avg_earnings" + column[len("mean"):]
+        elif column.startswith("weighted_count"):
+            names[column] = "population_size" + column[len("weighted_count"):]
+    return df.rename(columns=names)
+
+@cached
+def earnings_stats(state: Optional[str] = None, grouping: str = "PN_EMPSIT", with_se: bool = False):
+    return frame_records(earnings_frame(state, grouping, with_se))
+
+def telehealth_frame(state: Optional[str] = None, with_se: bool = False):
+    df = crosstab("PN_TELHLTH", state=state, with_se=with_se)
+    return df.rename(columns={"PN_TELHLTH": "category"})
+
+@cached
+def telehealth_stats(state: Optional[str] = None, with_se: bool = False):
+    return frame_records(telehealth_frame(state, with_se))
+
+def telehealth_by_nurse_type_frame(state: Optional[str] = None, with_se: bool = False):
+    """Breakdown of telehealth usage among those who USE telehealth (PN_TELHLTH=1) by RN vs NP"""
+    df = crosstab("APN_NP", state=state, filters={"PN_TELHLTH": 1}, with_se=with_se)
+    return df.rename(columns={"APN_NP": "nurse_type"})
+
+@cached
+def telehealth_by_nurse_type(state: Optional[str] = None, with_se: bool = False):
+    return frame_records(telehealth_by_nurse_type_frame(state, with_se))
+
+def telehealth_by_gender_frame(state: Optional[str] = None, with_se: bool = False):
+    """Breakdown of telehealth usage among those who USE telehealth (PN_TELHLTH=1) by gender"""
+    df = crosstab("SEX", state=state, filters={"PN_TELHLTH": 1}, with_se=with_se)
+    return df.rename(columns={"SEX": "gender"})
+
+@cached
+def telehealth_by_gender(state: Optional[str] = None, with_se: bool = False):
+    return frame_records(telehealth_by_gender_frame(state, with_se))
+
+def satisfaction_by_state_frame(with_se: bool = False):
+    """Get satisfaction percentages for each state, focusing on Extremely Satisfied and Extremely Dissatisfied"""
+    df = crosstab("PN_SATISFD", ["STATE_PUF"], with_se=with_se)
+    return df.rename(columns={"STATE_PUF": "state", "PN_SATISFD": "satisfaction_level"})
+
+@cached
+def satisfaction_by_state(with_se: bool = False):
+    return frame_records(satisfaction_by_state_frame(with_se))
+
+def satisfaction_by_rural_urban_frame(state: Optional[str] = None, with_se: bool = False):
+    """Get satisfaction by rural/urban classification for a specific state or all states"""
+    df = crosstab("PN_SATISFD", ["RN_RURAL"], state, with_se=with_se)
+    return df.rename(columns={"RN_RURAL": "area_type", "PN_SATISFD": "satisfaction_level"})
+
+@cached
+def satisfaction_by_rural_urban(state: Optional[str] = None, with_se: bool = False):
+    return frame_records(satisfaction_by_rural_urban_frame(state, with_se))
+
+# Microdata pages for /records: each page is one keyset query on rowid
+# (rowid > last seen ORDER BY rowid LIMIT page size) on a pooled connection that is
+# returned between pages, so memory stays at one page however large the export is.
+
+RECORDS_PAGE_SIZE = 5000
+
+def record_pages(columns: List[str], conditions: List[str], params: list, after: int, limit: Optional[int]):
+    """Yields lists of row tuples (rowid first) in rowid order, RECORDS_PAGE_SIZE at a time."""
+    query = f"""
+        SELECT rowid, {', '.join(columns)}
+        FROM nssrn
+        WHERE {' AND '.join(['rowid > ?', *conditions])}
+        ORDER BY rowid
+        LIMIT ?
+    """
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = RECORDS_PAGE_SIZE if remaining is None else min(RECORDS_PAGE_SIZE, remaining)
+        page_params = (after, *params, size)
+        with db_pool.connection(DB_PATH) as conn:
+            start = time.perf_counter()
+            with timed("sql"):
+                rows = conn.execute(query, page_params).fetchall()
+            slow_queries.record(conn, query, page_params, time.perf_counter() - start)
+        count("sql_queries")
+        count("sql_rows", len(rows))
+        if not rows:
+            return
+        yield rows
+        after = rows[-1][0]
+        if remaining is not None:
+            remaining -= len(rows)
+        if len(rows) < size:
+            return
+
+# Several panels in one call, for /bundle and the embedded dashboard
+
+# Panels by name
+PANELS = {
+    "filter_options": filter_options,
+    "burnout": burnout_stats,
+    "satisfaction": satisfaction_stats,
+    "earnings": earnings_stats,
+    "telehealth": telehealth_stats,
+    "telehealth_by_nurse_type": telehealth_by_nurse_type,
+    "telehealth_by_gender": telehealth_by_gender,
+    "satisfaction_by_state": satisfaction_by_state,
+    "satisfaction_by_rural_urban": satisfaction_by_rural_urban,
+    "crosstab": crosstab_stats,
+}
+
+# The same panels as DataFrames, for callers in this process (filter_options is not a table)
+PANEL_FRAMES = {
+    "burnout": burnout_frame,
+    "satisfaction": satisfaction_frame,
+    "earnings": earnings_frame,
+    "telehealth": telehealth_frame,
+    "telehealth_by_nurse_type": telehealth_by_nurse_type_frame,
+    "telehealth_by_gender": telehealth_by_gender_frame,
+    "satisfaction_by_state": satisfaction_by_state_frame,
+    "satisfaction_by_rural_urban": satisfaction_by_rural_urban_frame,
+    "crosstab": crosstab_frame,
+}
+
+def panel_params_model(panel: str, func):
+    """Pydantic model of a panel function's parameters, built from its signature."""
+    fields = {
+        name: (param.annotation, ... if param.default is inspect.Parameter.empty else param.default)
+        for name, param in inspect.signature(func).parameters.items()
+    }
+    return create_model(f"{panel}_params", **fields)
+
+# Validates and coerces bundle params the way FastAPI does a route's query parameters
+PANEL_PARAMS = {panel: panel_params_model(panel, func) for panel, func in PANELS.items()}
+
+def call_panel(panel: str, params: dict, state: Optional[str], as_frame: bool = False):
+    """
+    Runs a panel's function with the bundle's state and the given params (other
+    parameters take their defaults); the result goes through the result cache.
+    Params are validated and coerced to the function's parameter types.
+    as_frame: return the panel's DataFrame (PANEL_FRAMES) instead of cached records
+    """
+    func = PANELS.get(panel)
+    if func is None:
+        raise HTTPException(status_code=400, detail=f"Unknown panel: {panel}")
+    parameters = inspect.signature(func).parameters
+    unknown = set(params) - set(parameters)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown parameters for {panel}: {sorted(unknown)}")
+
+    arguments = {name: param.default for name, param in parameters.items()}
+    if "state" in parameters:
+        arguments["state"] = state
+    arguments.update(params)
+    missing = [name for name, value in arguments.items() if value is inspect.Parameter.empty]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Missing parameters for {panel}: {missing}")
+    try:
+        arguments = dict(PANEL_PARAMS[panel].model_validate(arguments))
+    except ValidationError as e:
+        problems = "; ".join(f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors())
+        raise HTTPException(status_code=400, detail=f"Invalid parameters for {panel}: {problems}")
+    if as_frame:
+        func = PANEL_FRAMES.get(panel, func)
+    return run_route(func, **arguments)
+
+def bundle(state: Optional[str], panels: List[dict], as_frames: bool = False) -> dict:
+    """
+    Several panels for one state: {"state", "dataset_version", "panels", "errors"}.
+    panels: [{"panel": name, "key": result name (defaults to panel), "params": {...}}]
+    A panel that fails is reported under errors instead of failing the whole bundle.
+    as_frames: table panels come back as DataFrames rather than records (embedded dashboard)
+    """
+    results = {}
+    errors = {}
+    for spec in panels:
+        key = spec.get("key") or spec["panel"]
+        try:
+            results[key] = call_panel(spec["panel"], spec.get("params") or {}, state, as_frames)
+        except HTTPException as e:
+            errors[key] = e.detail
+        except Exception as e:
+            logger.exception(f"Bundle panel {key} failed")
+            errors[key] = str(e)
+    return {
+        "state": state,
+        "dataset_version": dataset_version(),
+        "panels": results,
+        "errors": errors
+    }
@@ -1,11 +1,29 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-import sqlite3
-import pandas as pd
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+import csv
+import io
+import orjson
+import gzip
+import hashlib
 import os
-from typing import List, Optional
+import threading
+import time
+import inspect
+from functools import wraps
+from typing import Any, Dict, List, Optional
 import logging
 
+from api.metrics import MetricsMiddleware, MetricsRegistry, timed
+from api.engine import (
+    EARNINGS_GROUPINGS, ENGINE, bundle, burnout_stats, call_key, catalog_labels, crosstab_stats,
+    dataset_version, earnings_stats, filter_options, get_catalog, get_engine, parse_filter_value,
+    parse_filters, record_pages, result_cache, run_route, satisfaction_by_rural_urban,
+    satisfaction_by_state, satisfaction_stats, slow_queries, telehealth_by_gender,
+    telehealth_by_nurse_type, telehealth_stats
+)
+
 # Setup Logger
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -20,252 +38,354 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DB_PATH = os.path.join(BASE_DIR, "nursing.db")
+# Outermost middleware, so its timings cover the whole request
+metrics = MetricsRegistry()
+app.add_middleware(MetricsMiddleware, registry=metrics)
 
-def get_data(query: str):
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        logger.info(f"Executing query: {query}")
-        df = pd.read_sql_query(query, conn)
-        return df
-    except Exception as e:
-        logger.error(f"Database error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
+# Responses at least this large are gzipped for clients that accept it
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+
+def encode_json(content) -> bytes:
+    with timed("serialize"):
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+def compress(body: bytes) -> bytes:
+    with timed("gzip"):
+        return gzip.compress(body, GZIP_LEVEL)
+
+def json_response(request: Request, body: bytes, gzip_body=None, etag: Optional[str] = None):
+    """
+    The JSON body as a Response, gzipped when it is large and the client accepts gzip.
+    gzip_body: callable returning the compressed body, so callers can cache it
+    """
+    headers = {}
+    if len(body) >= GZIP_MIN_BYTES:
+        headers["Vary"] = "Accept-Encoding"
+        if accepts_gzip(request):
+            body = gzip_body() if gzip_body else compress(body)
+            headers["Content-Encoding"] = "gzip"
+    if etag:
+        # The gzip and identity bodies are different representations, so they get different tags
+        headers["ETag"] = f'"{etag}-gzip"' if "Content-Encoding" in headers else f'"{etag}"'
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def accepts_gzip(request: Request) -> bool:
+    return "gzip" in request.headers.get("accept-encoding", "")
+
+def matched_etag(request: Request, etag: str) -> Optional[str]:
+    """
+    The tag in If-None-Match that matches etag: its gzip or identity variant as sent
+    (the one for the client's Accept-Encoding first), '*', or None when nothing matches.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    tags = {tag.strip().removeprefix("W/").strip('"') for tag in header.split(",")}
+    variants = [f"{etag}-gzip", etag] if accepts_gzip(request) else [etag, f"{etag}-gzip"]
+    return next((tag for tag in variants + ["*"] if tag in tags), None)
+
+def json_endpoint(func):
+    """
+    Serves a route as JSON encoded once with orjson, bypassing FastAPI's generic encoder.
+    The route returns a cached api.engine result; the encoded (and gzipped) bodies are
+    cached next to it, and each response carries a strong ETag derived from the dataset
+    version and the call's arguments, so a matching If-None-Match gets a 304 without
+    running the route. wrapper.warm(**kwargs) fills the caches for one call without a request.
+    """
+    signature = inspect.signature(func)
+
+    def encoded(key, kwargs) -> bytes:
+        return result_cache.get_or_compute(("json", key), lambda: encode_json(run_route(func, **kwargs)))
+
+    @wraps(func)
+    def wrapper(request: Request, **kwargs):
+        key = call_key(func, signature, (), kwargs)
+        etag = hashlib.sha256(repr((dataset_version(), key)).encode()).hexdigest()[:32]
+        matched = matched_etag(request, etag)
+        if matched == "*":
+            # Answer with the tag of the representation this request would have received
+            gzipped = len(encoded(key, kwargs)) >= GZIP_MIN_BYTES and accepts_gzip(request)
+            matched = f"{etag}-gzip" if gzipped else etag
+        if matched:
+            return Response(status_code=304, headers={"ETag": f'"{matched}"', "Vary": "Accept-Encoding"})
+        body = encoded(key, kwargs)
+        gzip_body = lambda: result_cache.get_or_compute(("gzip", key), lambda: compress(body))
+        return json_response(request, body, gzip_body, etag)
+
+    request_parameter = inspect.Parameter("request", inspect.Parameter.POSITIONAL_OR_KEYWORD, annotation=Request)
+    wrapper.__signature__ = signature.replace(parameters=[request_parameter, *signature.parameters.values()])
+    wrapper.warm = lambda **kwargs: encoded(call_key(func, signature, (), kwargs), kwargs)
+    return wrapper
+
+@app.on_event("startup")
+def load_engine():
+    if ENGINE == "numpy":
+        get_engine()
 
 @app.get("/")
 def read_root():
     return {"message": "Nursing Workforce API is running"}
 
 @app.get("/filter_options")
+@json_endpoint
 def get_filter_options():
-    # Using STATE_PUF for state
-    states_query = "SELECT DISTINCT STATE_PUF FROM nssrn ORDER BY STATE_PUF"
-    settings_query = "SELECT DISTINCT PN_EMPSIT FROM nssrn ORDER BY PN_EMPSIT" 
-    
-    states = get_data(states_query)['STATE_PUF'].dropna().tolist()
-    settings = get_data(settings_query)['PN_EMPSIT'].dropna().tolist()
+    return filter_options()
+
+@app.get("/dataset_version")
+def get_dataset_version():
+    """Version stamp of the loaded dataset, which changes on every ETL load; clients key their caches on it"""
+    return {"dataset_version": dataset_version()}
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    """Hit/miss counters of the endpoint result cache"""
+    return result_cache.stats()
+
+@app.get("/admin/slow_queries")
+def get_slow_queries(limit: int = Query(10, ge=1, le=1000)):
+    """Slowest query shapes seen since startup, with the plan of their slowest run"""
     return {
-        "states": states,
-        "work_settings": settings
+        "threshold_ms": slow_queries.threshold_ms,
+        "log": slow_queries.path,
+        "queries": slow_queries.slowest(limit)
     }
 
-@app.get("/burnout")
-def get_burnout_stats(state: Optional[str] = None):
-    # Use CAST to ensure numeric summation works
-    where_clause = "WHERE 1=1"
-    if state:
-        where_clause += f" AND STATE_PUF = '{state}'"
-        
-    query = f"""
-        SELECT 
-            PN_BURNOUT as category,
-            SUM(CAST(RKRNWGTA AS REAL)) as weighted_count
-        FROM nssrn
-        {where_clause}
-        GROUP BY PN_BURNOUT
+@app.get("/catalog")
+@json_endpoint
+def get_catalog_labels():
+    """Variables, variable labels and value labels ([code, label] pairs) from the SAS program"""
+    return catalog_labels()
+
+# Weighted crosstabs (see api/engine.py for how they are answered)
+
+@app.get("/crosstab")
+@json_endpoint
+def get_crosstab(
+    outcome: str,
+    by: Optional[List[str]] = Query(None),
+    state: Optional[str] = None,
+    filter: Optional[List[str]] = Query(None, description="VARIABLE:value, repeatable"),
+    mean_of: Optional[str] = None,
+    with_se: bool = False
+):
     """
-    df = get_data(query)
-    
-    # Fill NaN categories if any (though grouping usually handles it)
-    df = df.dropna(subset=['category'])
-    
-    total = df['weighted_count'].sum()
-    if total > 0:
-        df['percentage'] = (df['weighted_count'] / total) * 100
-    else:
-        df['percentage'] = 0
-        
-    return df.to_dict(orient="records")
+    Weighted crosstab of outcome by up to two breakdown variables, e.g.
+    /crosstab?outcome=PN_SATISFD&by=SEX&filter=PN_TELHLTH:1&state=TX
+    """
+    return crosstab_stats(outcome, by, state, filter, mean_of, with_se)
+
+# The routes the dashboard uses, as fixed crosstabs
+
+@app.get("/burnout")
+@json_endpoint
+def get_burnout_stats(state: Optional[str] = None, with_se: bool = False):
+    return burnout_stats(state, with_se)
 
 @app.get("/satisfaction")
-def get_satisfaction_stats(state: Optional[str] = None, breakdown_by_gender: bool = False):
-    logger.info(f"get_satisfaction_stats called with state={state}, breakdown_by_gender={breakdown_by_gender}")
-    # Variable: PN_SATISFD
-    where_clause = "WHERE 1=1"
-    if state:
-        where_clause += f" AND STATE_PUF = '{state}'"
-    
-    # If breaking down by gender, include SEX in query
-    if breakdown_by_gender:
-        query = f"""
-            SELECT 
-                PN_SATISFD as category,
-                SEX as gender,
-                SUM(CAST(RKRNWGTA AS REAL)) as weighted_count
-            FROM nssrn
-            {where_clause}
-            GROUP BY PN_SATISFD, SEX
-        """
-        df = get_data(query)
-        df = df.dropna(subset=['category', 'gender'])
-        
-        # Calculate percentage within each gender
-        # First get totals per gender
-        gender_totals = df.groupby('gender')['weighted_count'].transform('sum')
-        df['percentage'] = (df['weighted_count'] / gender_totals) * 100
-        
-        return df.to_dict(orient="records")
-    else:
-        query = f"""
-            SELECT 
-                PN_SATISFD as category,
-                SUM(CAST(RKRNWGTA AS REAL)) as weighted_count
-            FROM nssrn
-            {where_clause}
-            GROUP BY PN_SATISFD
-        """
-        df = get_data(query)
-        df = df.dropna(subset=['category'])
-        
-        total = df['weighted_count'].sum()
-        if total > 0:
-            df['percentage'] = (df['weighted_count'] / total) * 100
-        else:
-            df['percentage'] = 0
-            
-        return df.to_dict(orient="records")
+@json_endpoint
+def get_satisfaction_stats(state: Optional[str] = None, breakdown_by_gender: bool = False, with_se: bool = False):
+    return satisfaction_stats(state, breakdown_by_gender, with_se)
 
 @app.get("/earnings")
-def get_earnings_stats(state: Optional[str] = None, grouping: str = "PN_EMPSIT"):
-    valid_groupings = ["PN_EMPSIT", "AGE_GP_PUF", "HIGHEDU_PUF", "SEX"]
-    if grouping not in valid_groupings:
-        grouping = "PN_EMPSIT"
-        
-    where_clause = "WHERE CAST(PN_EARN_PUF AS REAL) > 0"
-    if state:
-        where_clause += f" AND STATE_PUF = '{state}'"
-        
-    query = f"""
-        SELECT 
-            {grouping} as group_name,
-            SUM(CAST(PN_EARN_PUF AS REAL) * CAST(RKRNWGTA AS REAL)) / SUM(CAST(RKRNWGTA AS REAL)) as avg_earnings,
-            SUM(CAST(RKRNWGTA AS REAL)) as population_size
-        FROM nssrn
-        {where_clause}
-        GROUP BY {grouping}
-    """
-    df = get_data(query)
-    # Drop rows with null grouping
-    df = df.dropna(subset=['group_name'])
-    return df.to_dict(orient="records")
+@json_endpoint
+def get_earnings_stats(state: Optional[str] = None, grouping: str = "PN_EMPSIT", with_se: bool = False):
+    return earnings_stats(state, grouping, with_se)
 
 @app.get("/telehealth")
-def get_telehealth_stats(state: Optional[str] = None):
-    where_clause = "WHERE 1=1"
-    if state:
-        where_clause += f" AND STATE_PUF = '{state}'"
-        
-    query = f"""
-        SELECT 
-            PN_TELHLTH as category,
-            SUM(CAST(RKRNWGTA AS REAL)) as weighted_count
-        FROM nssrn
-        {where_clause}
-        GROUP BY PN_TELHLTH
-    """
-    df = get_data(query)
-    df = df.dropna(subset=['category'])
-    
-    total = df['weighted_count'].sum()
-    if total > 0:
-        df['percentage'] = (df['weighted_count'] / total) * 100
-    
-    return df.to_dict(orient="records")
+@json_endpoint
+def get_telehealth_stats(state: Optional[str] = None, with_se: bool = False):
+    return telehealth_stats(state, with_se)
 
 @app.get("/telehealth/by_nurse_type")
-def get_telehealth_by_nurse_type(state: Optional[str] = None):
+@json_endpoint
+def get_telehealth_by_nurse_type(state: Optional[str] = None, with_se: bool = False):
     """Breakdown of telehealth usage among those who USE telehealth (PN_TELHLTH=1) by RN vs NP"""
-    where_clause = "WHERE PN_TELHLTH = 1"  # Only those using telehealth
-    if state:
-        where_clause += f" AND STATE_PUF = '{state}'"
-        
-    query = f"""
-        SELECT 
-            APN_NP as nurse_type,
-            SUM(CAST(RKRNWGTA AS REAL)) as weighted_count
-        FROM nssrn
-        {where_clause}
-        GROUP BY APN_NP
-    """
-    df = get_data(query)
-    df = df.dropna(subset=['nurse_type'])
-    
-    total = df['weighted_count'].sum()
-    if total > 0:
-        df['percentage'] = (df['weighted_count'] / total) * 100
-    
-    return df.to_dict(orient="records")
+    return telehealth_by_nurse_type(state, with_se)
 
 @app.get("/telehealth/by_gender")
-def get_telehealth_by_gender(state: Optional[str] = None):
+@json_endpoint
+def get_telehealth_by_gender(state: Optional[str] = None, with_se: bool = False):
     """Breakdown of telehealth usage among those who USE telehealth (PN_TELHLTH=1) by gender"""
-    where_clause = "WHERE PN_TELHLTH = 1"  # Only those using telehealth
-    if state:
-        where_clause += f" AND STATE_PUF = '{state}'"
-        
-    query = f"""
-        SELECT 
-            SEX as gender,
-            SUM(CAST(RKRNWGTA AS REAL)) as weighted_count
-        FROM nssrn
-        {where_clause}
-        GROUP BY SEX
-    """
-    df = get_data(query)
-    df = df.dropna(subset=['gender'])
-    
-    total = df['weighted_count'].sum()
-    if total > 0:
-        df['percentage'] = (df['weighted_count'] / total) * 100
-    
-    return df.to_dict(orient="records")
+    return telehealth_by_gender(state, with_se)
 
 @app.get("/satisfaction/by_state")
-def get_satisfaction_by_state():
+@json_endpoint
+def get_satisfaction_by_state(with_se: bool = False):
     """Get satisfaction percentages for each state, focusing on Extremely Satisfied and Extremely Dissatisfied"""
-    query = """
-        SELECT 
-            STATE_PUF as state,
-            PN_SATISFD as satisfaction_level,
-            SUM(CAST(RKRNWGTA AS REAL)) as weighted_count
-        FROM nssrn
-        WHERE STATE_PUF IS NOT NULL AND PN_SATISFD IS NOT NULL
-        GROUP BY STATE_PUF, PN_SATISFD
-    """
-    df = get_data(query)
-    
-    # Calculate percentage within each state
-    state_totals = df.groupby('state')['weighted_count'].transform('sum')
-    df['percentage'] = (df['weighted_count'] / state_totals) * 100
-    
-    return df.to_dict(orient="records")
+    return satisfaction_by_state(with_se)
 
 @app.get("/satisfaction/by_rural_urban")
-def get_satisfaction_by_rural_urban(state: Optional[str] = None):
+@json_endpoint
+def get_satisfaction_by_rural_urban(state: Optional[str] = None, with_se: bool = False):
     """Get satisfaction by rural/urban classification for a specific state or all states"""
-    where_clause = "WHERE RN_RURAL IS NOT NULL AND PN_SATISFD IS NOT NULL"
+    return satisfaction_by_rural_urban(state, with_se)
+
+# Microdata export
+#
+# /records streams rows of nssrn page by page (api.engine.record_pages), so memory stays
+# at one page however large the export is.
+
+RECORDS_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+def ndjson_lines(names: List[str], pages):
+    for rows in pages:
+        yield b"".join(encode_json(dict(zip(names, row[1:]))) + b"\n" for row in rows)
+
+def csv_lines(names: List[str], pages):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for rows in pages:
+        writer.writerows(row[1:] for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+@app.get("/records")
+def get_records(
+    columns: List[str] = Query(..., description="Variables to return, repeatable; 'rowid' gives the row's key"),
+    state: Optional[str] = None,
+    filter: Optional[List[str]] = Query(None, description="VARIABLE:value, repeatable"),
+    format: str = "ndjson",
+    after: int = Query(0, ge=0, description="Resume after this rowid"),
+    limit: Optional[int] = Query(None, ge=1)
+):
+    """
+    Streams nssrn rows as NDJSON or CSV, e.g.
+    /records?columns=STATE_PUF&columns=PN_EARN_PUF&filter=SEX:2&state=TX&format=csv
+    """
+    if format not in RECORDS_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {sorted(RECORDS_FORMATS)}")
+    variables = {var['name']: var for var in get_catalog()['variables']}
+    unknown = [name for name in columns if name != "rowid" and name not in variables]
+    filters = parse_filters(filter)
+    unknown += [name for name in filters if name not in variables]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown variables: {unknown}")
+
+    conditions = []
+    params = []
     if state:
-        where_clause += f" AND STATE_PUF = '{state}'"
-    
-    query = f"""
-        SELECT 
-            RN_RURAL as area_type,
-            PN_SATISFD as satisfaction_level,
-            SUM(CAST(RKRNWGTA AS REAL)) as weighted_count
-        FROM nssrn
-        {where_clause}
-        GROUP BY RN_RURAL, PN_SATISFD
+        conditions.append("STATE_PUF = ?")
+        params.append(state)
+    for name, value in filters.items():
+        conditions.append(f"{name} = ?")
+        params.append(parse_filter_value(variables[name], value))
+
+    pages = record_pages(columns, conditions, params, after, limit)
+    lines = ndjson_lines(columns, pages) if format == "ndjson" else csv_lines(columns, pages)
+    return StreamingResponse(
+        lines,
+        media_type=RECORDS_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="nssrn_records.{format}"'}
+    )
+
+# Dashboard panels in one round trip
+
+class PanelSpec(BaseModel):
+    panel: str
+    key: Optional[str] = None  # name of the result in the response, defaults to panel
+    params: Dict[str, Any] = {}
+
+class BundleRequest(BaseModel):
+    state: Optional[str] = None
+    panels: List[PanelSpec]
+
+@app.post("/bundle")
+def get_bundle(request: BundleRequest, http_request: Request):
     """
-    df = get_data(query)
-    
-    # Calculate percentage within each area type
-    area_totals = df.groupby('area_type')['weighted_count'].transform('sum')
-    df['percentage'] = (df['weighted_count'] / area_totals) * 100
-    
-    return df.to_dict(orient="records")
+    Several panels (api.engine.PANELS) for one state in a single request, e.g.
+    {"state": "TX", "panels": [{"panel": "burnout"}, {"panel": "earnings", "params": {"grouping": "SEX"}}]}
+    A panel that fails is reported under errors instead of failing the whole bundle.
+    """
+    panels = [spec.model_dump() for spec in request.panels]
+    return json_response(http_request, encode_json(bundle(request.state, panels)))
+
+# Warm-up
+#
+# With NSSRN_WARMUP=1 a background thread started at startup precomputes every route
+# for the nation and every state, with every parameter combination, into the result
+# cache. /ready reports its progress and answers 503 until it is done, so launchers can
+# wait for a warm cache instead of sleeping.
+
+WARMUP = os.environ.get("NSSRN_WARMUP", "0") == "1"
+
+_warmup = {"enabled": WARMUP, "ready": not WARMUP, "done": 0, "failed": 0, "total": 0, "seconds": None}
+_warmup_lock = threading.Lock()
+
+def warmup_calls():
+    """(route, kwargs) for every route and parameter combination the API serves."""
+    calls = [(get_filter_options, {}), (get_catalog_labels, {})]
+    calls += [(get_satisfaction_by_state, {"with_se": with_se}) for with_se in (False, True)]
+    states = [None] + filter_options()["states"]
+    for state in states:
+        for with_se in (False, True):
+            calls += [
+                (get_burnout_stats, {"state": state, "with_se": with_se}),
+                (get_satisfaction_stats, {"state": state, "breakdown_by_gender": False, "with_se": with_se}),
+                (get_satisfaction_stats, {"state": state, "breakdown_by_gender": True, "with_se": with_se}),
+                (get_telehealth_stats, {"state": state, "with_se": with_se}),
+                (get_telehealth_by_nurse_type, {"state": state, "with_se": with_se}),
+                (get_telehealth_by_gender, {"state": state, "with_se": with_se}),
+                (get_satisfaction_by_rural_urban, {"state": state, "with_se": with_se}),
+            ]
+            calls += [
+                (get_earnings_stats, {"state": state, "grouping": grouping, "with_se": with_se})
+                for grouping in EARNINGS_GROUPINGS
+            ]
+    return calls
+
+def run_warmup():
+    start = time.perf_counter()
+    try:
+        calls = warmup_calls()
+    except Exception as e:
+        logger.error(f"Warm-up could not list the states: {e}")
+        calls = []
+    with _warmup_lock:
+        _warmup["total"] = len(calls)
+    for route, kwargs in calls:
+        try:
+            route.warm(**kwargs)
+            outcome = "done"
+        except Exception as e:
+            logger.warning(f"Warm-up of {route.__name__}({kwargs}) failed: {e}")
+            outcome = "failed"
+        with _warmup_lock:
+            _warmup[outcome] += 1
+    with _warmup_lock:
+        _warmup.update(ready=True, seconds=round(time.perf_counter() - start, 3))
+    logger.info(f"Warm-up finished: {_warmup}")
+
+@app.on_event("startup")
+def start_warmup():
+    if WARMUP:
+        threading.Thread(target=run_warmup, name="warmup", daemon=True).start()
+
+@app.get("/ready")
+def get_ready(response: Response):
+    """Warm-up progress; 503 until the warm-up (when enabled) has finished"""
+    with _warmup_lock:
+        status = dict(_warmup)
+    if not status["ready"]:
+        response.status_code = 503
+    return status
+
+@app.get("/metrics")
+def get_metrics():
+    """Per-route request counts, latency histograms and quantiles, phase timings and cache counters (Prometheus text format)"""
+    cache = result_cache.stats()
+    gauges = {
+        "nssrn_result_cache_entries": ("gauge", "Entries in the result cache", cache["entries"]),
+        "nssrn_result_cache_hits_total": ("counter", "Result cache hits", cache["hits"]),
+        "nssrn_result_cache_misses_total": ("counter", "Result cache misses", cache["misses"]),
+        "nssrn_result_cache_evictions_total": ("counter", "Result cache evictions", cache["evictions"]),
+        "nssrn_result_cache_hit_ratio": ("gauge", "Result cache hits / lookups", float(cache["hit_rate"])),
+    }
+    return Response(content=metrics.render(gauges), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 if __name__ == "__main__":
     import uvicorn
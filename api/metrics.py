@@ -0,0 +1,193 @@
+import bisect
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+from urllib.parse import parse_qsl
+
+# Request latency histogram buckets (seconds)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Quantiles reported from the most recent RESERVOIR_SIZE latencies of each series
+QUANTILES = (0.5, 0.95, 0.99)
+RESERVOIR_SIZE = 1024
+# Further route/parameter shapes are folded into params="other" to bound cardinality
+MAX_SERIES = 500
+
+# Timings and counters of the request being served, filled in by timed() and count()
+_current = contextvars.ContextVar("nssrn_request_values", default=None)
+
+@contextmanager
+def timed(phase: str):
+    """Adds the time spent in the block to phase for the current request, if any."""
+    values = _current.get()
+    if values is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        values[phase] = values.get(phase, 0.0) + time.perf_counter() - start
+
+def count(name: str, amount: float = 1):
+    """Adds amount to the counter name for the current request, if any."""
+    values = _current.get()
+    if values is not None:
+        values[name] = values.get(name, 0) + amount
+
+class Series:
+    """Everything recorded for one (route, params) shape."""
+
+    def __init__(self):
+        self.statuses = {}
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=RESERVOIR_SIZE)
+        self.values = {}
+
+    def observe(self, status: int, seconds: float, values: Dict[str, float]):
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        index = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        if index < len(self.buckets):
+            self.buckets[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.recent.append(seconds)
+        for name, value in values.items():
+            self.values[name] = self.values.get(name, 0) + value
+
+    def quantiles(self):
+        ordered = sorted(self.recent)
+        if not ordered:
+            return {}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+# Per-request values rendered as counters: name -> (metric, help, extra labels)
+PHASES = ("sql", "parquet", "engine", "pandas", "serialize", "gzip")
+COUNTERS = {
+    "sql_queries": ("nssrn_sql_queries_total", "SQL statements executed", {}),
+    "sql_rows": ("nssrn_sql_rows_total", "Rows returned by SQL to pandas", {}),
+    "response_rows": ("nssrn_response_rows_total", "Rows in JSON responses", {}),
+    "cache_hits": ("nssrn_cache_lookups_total", "Result cache lookups", {"result": "hit"}),
+    "cache_misses": ("nssrn_cache_lookups_total", "Result cache lookups", {"result": "miss"}),
+}
+
+class MetricsRegistry:
+    def __init__(self):
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, route: str, params: str, status: int, seconds: float, values: Dict[str, float]):
+        # Route handler time not spent in SQL, Parquet or the engine is pandas work
+        handler = values.pop("handler", None)
+        if handler is not None:
+            values["pandas"] = max(0.0, handler - sum(values.get(phase, 0.0) for phase in ("sql", "parquet", "engine")))
+        with self._lock:
+            key = (route, params)
+            series = self._series.get(key)
+            if series is None:
+                if len(self._series) >= MAX_SERIES:
+                    key = (route, "other")
+                series = self._series.setdefault(key, Series())
+            series.observe(status, seconds, values)
+
+    def render(self, gauges: Optional[Dict[str, tuple]] = None) -> str:
+        """
+        Prometheus text exposition of every series.
+        gauges: extra process-wide values, {metric: (type, help, value)}
+        """
+        with self._lock:
+            snapshot = [
+                (route, params, dict(s.statuses), list(s.buckets), s.count, s.total, s.quantiles(), dict(s.values))
+                for (route, params), s in sorted(self._series.items())
+            ]
+
+        families = {}
+        def add(metric, kind, help_text, labels, value, suffix=""):
+            family = families.setdefault(metric, (kind, help_text, []))
+            text = f"{value:.9g}" if isinstance(value, float) else str(value)
+            family[2].append(f"{metric}{suffix}{labels} {text}")
+
+        for route, params, statuses, buckets, count_, total, quantiles, values in snapshot:
+            for status, n in sorted(statuses.items()):
+                add("nssrn_http_requests_total", "counter", "Requests by route, query parameter names and status",
+                    _labels(route=route, params=params, status=status), n)
+
+            histogram = "nssrn_http_request_duration_seconds"
+            cumulative = 0
+            labels = _labels(route=route, params=params)
+            for bound, n in zip(LATENCY_BUCKETS, buckets):
+                cumulative += n
+                add(histogram, "histogram", "Request latency", _labels(route=route, params=params, le=bound), cumulative, "_bucket")
+            add(histogram, "histogram", "", _labels(route=route, params=params, le="+Inf"), count_, "_bucket")
+            add(histogram, "histogram", "", labels, total, "_sum")
+            add(histogram, "histogram", "", labels, count_, "_count")
+
+            summary = "nssrn_http_request_latency_seconds"
+            summary_help = f"Request latency quantiles over the last {RESERVOIR_SIZE} requests"
+            for q, value in quantiles.items():
+                add(summary, "summary", summary_help, _labels(route=route, params=params, quantile=q), value)
+            add(summary, "summary", summary_help, labels, total, "_sum")
+            add(summary, "summary", summary_help, labels, count_, "_count")
+
+            for phase in PHASES:
+                if phase in values:
+                    add("nssrn_phase_seconds_total", "counter", "Time spent per phase: sql, parquet, engine, pandas, serialize, gzip",
+                        _labels(route=route, params=params, phase=phase), float(values[phase]))
+            for name, (metric, help_text, extra) in COUNTERS.items():
+                if name in values:
+                    add(metric, "counter", help_text, _labels(route=route, params=params, **extra), values[name])
+
+        for metric, (kind, help_text, value) in (gauges or {}).items():
+            add(metric, kind, help_text, "", value)
+
+        lines = []
+        for metric, (kind, help_text, samples) in families.items():
+            if help_text:
+                lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request and recording it under the matched route's
+    path template and the names (not values) of its query parameters.
+    """
+
+    def __init__(self, app, registry: MetricsRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        values = {}
+        token = _current.set(values)
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            seconds = time.perf_counter() - start
+            _current.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            names = {name for name, _ in parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)}
+            self.registry.observe(route, ",".join(sorted(names)), status[0], seconds, values)
@@ -0,0 +1,202 @@
+import re
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+# Coded columns the engine can filter and group on
+DIMENSION_COLUMNS = [
+    "STATE_PUF", "SEX", "PN_BURNOUT", "PN_SATISFD", "PN_TELHLTH", "APN_NP",
+    "RN_RURAL", "PN_EMPSIT", "AGE_GP_PUF", "HIGHEDU_PUF",
+]
+WEIGHT_COLUMN = "RKRNWGTA"
+EARNINGS_COLUMN = "PN_EARN_PUF"
+ENGINE_COLUMNS = DIMENSION_COLUMNS + [EARNINGS_COLUMN, WEIGHT_COLUMN]
+
+# Successive-difference replicate weights RKRNWGT1..RKRNWGT80. Per the NSSRN variance
+# guide, Var(theta) = 4/R * sum_r (theta_r - theta)^2 with R = 80 replicates.
+REPLICATE_PATTERN = re.compile(r"^RKRNWGT(\d+)$")
+SDR_FACTOR = 4.0
+Z_95 = 1.96
+
+def replicate_columns(names: List[str]) -> List[str]:
+    """The replicate weight columns among names, in replicate order."""
+    matches = [(int(m.group(1)), name) for name in names for m in [REPLICATE_PATTERN.match(name)] if m]
+    return [name for _, name in sorted(matches)]
+
+def sdr_columns(prefix: str, estimate: np.ndarray, replicates: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Standard error, 95% CI and relative standard error of estimate (one value per group)
+    from its replicate estimates (groups x R).
+    """
+    count = replicates.shape[1]
+    se = np.sqrt(SDR_FACTOR / count * ((replicates - estimate[:, None]) ** 2).sum(axis=1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rse = np.where(estimate != 0, se / np.abs(estimate), np.nan)
+    return {
+        f"{prefix}_se": se,
+        f"{prefix}_ci_lower": estimate - Z_95 * se,
+        f"{prefix}_ci_upper": estimate + Z_95 * se,
+        f"{prefix}_rse": rse,
+    }
+
+class ArrayStore:
+    """
+    The API's columns held as contiguous NumPy arrays. Every coded column is stored as
+    int32 codes into its sorted distinct values (-1 for null), so a weighted GROUP BY is
+    one mixed-radix key computation plus an np.bincount over the selected rows.
+    """
+
+    def __init__(self, frame: pd.DataFrame):
+        self.size = len(frame)
+        self.weights = np.ascontiguousarray(frame[WEIGHT_COLUMN].to_numpy(dtype=np.float64, na_value=0.0))
+        # rows x replicates matrix; zero columns when the frame has no replicate weights
+        self.replicate_names = replicate_columns(list(frame.columns))
+        self.replicates = np.ascontiguousarray(
+            frame[self.replicate_names].to_numpy(dtype=np.float64, na_value=0.0)
+        ).reshape(self.size, len(self.replicate_names))
+        self.earnings = np.ascontiguousarray(frame[EARNINGS_COLUMN].to_numpy(dtype=np.float64, na_value=np.nan))
+        self.codes = {}
+        self.levels = {}
+        self.level_index = {}
+        for column in DIMENSION_COLUMNS:
+            codes, levels = pd.factorize(frame[column], sort=True)
+            self.codes[column] = np.ascontiguousarray(codes, dtype=np.int32)
+            self.levels[column] = np.asarray(levels.to_numpy() if hasattr(levels, "to_numpy") else levels)
+            self.level_index[column] = {value: i for i, value in enumerate(self.levels[column].tolist())}
+
+    def _mask(self, state: Optional[str], filters: Optional[Dict[str, object]]):
+        """Boolean row mask for STATE_PUF == state and each column == value in filters."""
+        conditions = dict(filters or {})
+        if state:
+            conditions["STATE_PUF"] = state
+        mask = np.ones(self.size, dtype=bool)
+        for column, value in conditions.items():
+            code = self.level_index[column].get(value)
+            if code is None:
+                return np.zeros(self.size, dtype=bool)
+            mask &= self.codes[column] == code
+        return mask
+
+    def _group(self, keys: List[str], mask: np.ndarray):
+        """Flat group index of every selected row with no null key, plus the key radices."""
+        shape = tuple(len(self.levels[key]) for key in keys)
+        flat = np.zeros(self.size, dtype=np.int64)
+        for key, radix in zip(keys, shape):
+            codes = self.codes[key]
+            mask = mask & (codes >= 0)
+            flat = flat * radix + codes
+        return flat[mask], mask, shape
+
+    def _frame(self, keys: List[str], shape, groups: np.ndarray, **values):
+        decoded = np.unravel_index(groups, shape) if keys else ()
+        data = {key: self.levels[key][codes] for key, codes in zip(keys, decoded)}
+        data.update(values)
+        return pd.DataFrame(data)
+
+    def weighted_counts(self, keys: List[str], state: Optional[str] = None,
+                        filters: Optional[Dict[str, object]] = None) -> pd.DataFrame:
+        """
+        SUM(RKRNWGTA) grouped by keys, like GROUP BY with null keys dropped.
+        Returns one row per group present in the selection, ordered by key values.
+        """
+        index, mask, shape = self._group(keys, self._mask(state, filters))
+        size = int(np.prod(shape))
+        totals = np.bincount(index, weights=self.weights[mask], minlength=size)
+        groups = np.flatnonzero(np.bincount(index, minlength=size))
+        return self._frame(keys, shape, groups, weighted_count=totals[groups])
+
+    def weighted_means(self, keys: List[str], state: Optional[str] = None,
+                       filters: Optional[Dict[str, object]] = None) -> pd.DataFrame:
+        """
+        Weighted mean of PN_EARN_PUF over earners (PN_EARN_PUF > 0) grouped by keys, as
+        mean, with the weight total of those earners as weighted_count.
+        """
+        earners = self._mask(state, filters) & (self.earnings > 0)
+        index, mask, shape = self._group(keys, earners)
+        size = int(np.prod(shape))
+        weights = self.weights[mask]
+        population = np.bincount(index, weights=weights, minlength=size)
+        earnings = np.bincount(index, weights=weights * self.earnings[mask], minlength=size)
+        groups = np.flatnonzero(np.bincount(index, minlength=size))
+        return self._frame(
+            keys, shape, groups,
+            weighted_count=population[groups],
+            mean=earnings[groups] / population[groups]
+        )
+
+    def _replicate_totals(self, index: np.ndarray, mask: np.ndarray, weights: Optional[np.ndarray] = None):
+        """
+        Group totals of every replicate weight at once: the (groups x rows) indicator
+        matrix times the (rows x R) replicate matrix, done by sorting the selected rows
+        by group and summing each run with np.add.reduceat.
+        weights: optional per-row multiplier for the selected rows (e.g. earnings)
+        """
+        if not len(self.replicate_names):
+            raise ValueError("The dataset has no replicate weights (RKRNWGT1..RKRNWGT80)")
+        order = np.argsort(index, kind="stable")
+        sorted_index = index[order]
+        matrix = self.replicates[np.flatnonzero(mask)[order]]
+        if weights is not None:
+            matrix *= weights[order][:, None]
+        if not len(sorted_index):
+            return np.zeros((0, matrix.shape[1]))
+        starts = np.flatnonzero(np.r_[True, sorted_index[1:] != sorted_index[:-1]])
+        return np.add.reduceat(matrix, starts, axis=0)
+
+    def count_standard_errors(self, keys: List[str], state: Optional[str] = None,
+                              filters: Optional[Dict[str, object]] = None,
+                              within: Optional[List[str]] = None, earners: bool = False) -> pd.DataFrame:
+        """
+        SDR standard errors for weighted_counts(keys, state, filters): one row per group
+        in the same order, with the key columns plus weighted_count_* and percentage_*
+        (se, ci_lower, ci_upper, rse). Percentages are shares of the total over groups
+        that share the same values of the within keys (all groups when within is empty).
+        earners: count only earners, like weighted_means
+        """
+        selected = self._mask(state, filters)
+        if earners:
+            selected &= self.earnings > 0
+        index, mask, shape = self._group(keys, selected)
+        size = int(np.prod(shape))
+        counts = np.bincount(index, weights=self.weights[mask], minlength=size)
+        groups = np.flatnonzero(np.bincount(index, minlength=size))
+        counts = counts[groups]
+        replicates = self._replicate_totals(index, mask)
+
+        # Denominator of each group's percentage, for the full sample and every replicate
+        decoded = np.unravel_index(groups, shape) if keys else ()
+        within_codes = [codes for key, codes in zip(keys, decoded) if key in (within or [])]
+        if within_codes:
+            _, parent = np.unique(np.stack(within_codes, axis=1), axis=0, return_inverse=True)
+            parent = parent.ravel()
+        else:
+            parent = np.zeros(len(groups), dtype=np.int64)
+        parents = int(parent.max()) + 1 if len(parent) else 0
+        totals = np.bincount(parent, weights=counts, minlength=parents)
+        replicate_totals = np.zeros((parents, replicates.shape[1]))
+        np.add.at(replicate_totals, parent, replicates)
+
+        percentage = counts / totals[parent] * 100
+        replicate_percentage = replicates / replicate_totals[parent] * 100
+        columns = sdr_columns("weighted_count", counts, replicates)
+        columns.update(sdr_columns("percentage", percentage, replicate_percentage))
+        return self._frame(keys, shape, groups, **columns)
+
+    def mean_standard_errors(self, keys: List[str], state: Optional[str] = None,
+                             filters: Optional[Dict[str, object]] = None) -> pd.DataFrame:
+        """
+        SDR standard errors for weighted_means(keys, state, filters), in the same row order:
+        the key columns plus mean_* (se, ci_lower, ci_upper, rse).
+        """
+        earners = self._mask(state, filters) & (self.earnings > 0)
+        index, mask, shape = self._group(keys, earners)
+        size = int(np.prod(shape))
+        weights = self.weights[mask]
+        earnings = self.earnings[mask]
+        population = np.bincount(index, weights=weights, minlength=size)
+        weighted_earnings = np.bincount(index, weights=weights * earnings, minlength=size)
+        groups = np.flatnonzero(np.bincount(index, minlength=size))
+        mean = weighted_earnings[groups] / population[groups]
+
+        replicate_mean = self._replicate_totals(index, mask, earnings) / self._replicate_totals(index, mask)
+        return self._frame(keys, shape, groups, **sdr_columns("mean", mean, replicate_mean))
@@ -2,9 +2,22 @@ import streamlit as st
 import pandas as pd
 import requests
 import altair as alt
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# US states geometry (built by states_topojson.py) and the state codes it is keyed on
+from states_topojson import OUTPUT_FILE as STATES_TOPOJSON, STATE_FIPS, STATE_NAMES
 
 # Config
 API_URL = "http://localhost:8001"
+# With NSSRN_EMBEDDED=1 (single-box installs) the dashboard runs the API's query engine
+# in its own process and gets results without HTTP or JSON; otherwise it calls API_URL
+EMBEDDED = os.environ.get("NSSRN_EMBEDDED", "0") == "1"
+if EMBEDDED:
+    from api import engine
 
 # UT Tyler Brand Colors
 UT_ORANGE = "#BF5700"  # PMS 159
@@ -16,127 +29,202 @@ st.title("Nursing Workforce 2022 Dashboard")
 st.markdown("Insights from the 2022 National Sample Survey of Registered Nurses.")
 
 # Data Fetching
-@st.cache_data
-def get_filter_options():
-    try:
-        resp = requests.get(f"{API_URL}/filter_options")
-        if resp.status_code == 200:
-            return resp.json()
-    except Exception as e:
-        st.error(f"Failed to connect to API: {e}")
-    return {"states": [], "work_settings": []}
-
-@st.cache_data
-def get_burnout(state=None):
-    params = {}
-    if state:
-        params['state'] = state
-    resp = requests.get(f"{API_URL}/burnout", params=params)
-    return pd.DataFrame(resp.json())
-
-@st.cache_data
-def get_earnings(state=None, grouping="PN_EMPSIT"):
-    params = {'grouping': grouping}
-    if state:
-        params['state'] = state
-    resp = requests.get(f"{API_URL}/earnings", params=params)
-    return pd.DataFrame(resp.json())
-
-@st.cache_data
-def get_satisfaction_v2(state=None, breakdown_by_gender=False):
-    params = {}
-    if state:
-        params['state'] = state
-    if breakdown_by_gender:
-        params['breakdown_by_gender'] = True
-    resp = requests.get(f"{API_URL}/satisfaction", params=params)
-    return pd.DataFrame(resp.json())
-
-@st.cache_data
-def get_telehealth(state=None):
-    params = {}
-    if state:
-        params['state'] = state
-    resp = requests.get(f"{API_URL}/telehealth", params=params)
-    return pd.DataFrame(resp.json())
-
-@st.cache_data
-def get_telehealth_by_nurse_type(state=None):
-    params = {}
-    if state:
-        params['state'] = state
-    try:
-        resp = requests.get(f"{API_URL}/telehealth/by_nurse_type", params=params)
-        if resp.status_code == 200:
-            data = resp.json()
-            if data:  # Check if data is not empty
-                return pd.DataFrame(data)
-    except Exception as e:
-        st.error(f"Failed to fetch telehealth by nurse type: {e}")
-    return pd.DataFrame()  # Return empty DataFrame
-
-@st.cache_data
-def get_telehealth_by_gender(state=None):
-    params = {}
-    if state:
-        params['state'] = state
-    try:
-        resp = requests.get(f"{API_URL}/telehealth/by_gender", params=params)
-        if resp.status_code == 200:
-            data = resp.json()
-            if data:  # Check if data is not empty
-                return pd.DataFrame(data)
-    except Exception as e:
-        st.error(f"Failed to fetch telehealth by gender: {e}")
-    return pd.DataFrame()  # Return empty DataFrame
+REQUEST_TIMEOUT = (3.05, 30)  # connect, read (seconds)
+REQUEST_RETRIES = 3
+FETCH_WORKERS = 4
+# Seconds between checks of the dataset version the persisted results are keyed on
+DATASET_VERSION_TTL = 30
+
+@st.cache_resource
+def get_session():
+    """One keep-alive connection pool shared by every fetch, retrying connection errors and 502/503/504"""
+    retry = Retry(total=REQUEST_RETRIES, backoff_factor=0.3, status_forcelist=(502, 503, 504), allowed_methods=None)
+    adapter = HTTPAdapter(pool_maxsize=FETCH_WORKERS, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def api_get(session, path, **params):
+    resp = session.get(f"{API_URL}{path}", params=params, timeout=REQUEST_TIMEOUT)
+    resp.raise_for_status()
+    return resp.json()
+
+def api_post(session, path, body):
+    resp = session.post(f"{API_URL}{path}", json=body, timeout=REQUEST_TIMEOUT)
+    resp.raise_for_status()
+    return resp.json()
+
+def fetch_dataset_version(session):
+    if EMBEDDED:
+        return engine.dataset_version()
+    return api_get(session, "/dataset_version")["dataset_version"]
+
+def fetch_catalog(session):
+    return engine.catalog_labels() if EMBEDDED else api_get(session, "/catalog")
+
+def fetch_filter_options(session):
+    return engine.filter_options() if EMBEDDED else api_get(session, "/filter_options")
 
-@st.cache_data
-def get_satisfaction_by_state():
+def fetch_bundle(session, state, panels):
+    """
+    The /bundle response for panels, with each panel as a DataFrame. Embedded, the
+    engine computes it in-process and hands over its DataFrames as they are.
+    """
+    if EMBEDDED:
+        return engine.bundle(state, panels, as_frames=True)
+    data = api_post(session, "/bundle", {"state": state, "panels": panels})
+    data["panels"] = {key: pd.DataFrame(rows) for key, rows in data["panels"].items()}
+    return data
+
+def fetch_concurrently(calls):
+    """
+    Runs (function, args) pairs on a thread pool, each called as function(session, *args),
+    and returns their results in order, with the exception in place of the result for
+    calls that failed. Streamlit calls such as st.error only work on the script thread,
+    so callers report the failures.
+    """
+    session = get_session()
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        futures = [pool.submit(func, session, *args) for func, args in calls]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append(e)
+    return results
+
+# API results are cached on disk (Streamlit's persist="disk"), so they survive restarts,
+# and keyed on the dataset version, so an ETL run invalidates them. Failed fetches raise
+# instead of returning, so they are never cached and the next rerun tries again.
+
+# The dataset version the disk cache holds results for, kept next to Streamlit's cache
+# directory so a restarted dashboard also notices an ETL run that happened while it was down
+DATASET_VERSION_FILE = os.path.join(os.path.expanduser("~"), ".streamlit", "nssrn_dataset_version")
+
+def read_cached_dataset_version():
     try:
-        resp = requests.get(f"{API_URL}/satisfaction/by_state")
-        if resp.status_code == 200:
-            data = resp.json()
-            if data:
-                return pd.DataFrame(data)
-    except Exception as e:
-        st.error(f"Failed to fetch satisfaction by state: {e}")
-    return pd.DataFrame()
-
-@st.cache_data
-def get_satisfaction_by_rural_urban(state=None):
-    params = {}
-    if state:
-        params['state'] = state
+        with open(DATASET_VERSION_FILE) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def write_cached_dataset_version(version):
+    os.makedirs(os.path.dirname(DATASET_VERSION_FILE), exist_ok=True)
+    tmp_file = f"{DATASET_VERSION_FILE}.tmp"
+    with open(tmp_file, "w") as f:
+        f.write(version)
+    os.replace(tmp_file, DATASET_VERSION_FILE)
+
+@st.cache_data(ttl=DATASET_VERSION_TTL, show_spinner=False)
+def get_dataset_version():
+    version = fetch_dataset_version(get_session())
+    if read_cached_dataset_version() != version:
+        # The ETL replaced the data (or the cache's version is unknown): drop the old
+        # version's results from memory and disk
+        get_catalog_and_filter_options.clear()
+        get_panels.clear()
+        write_cached_dataset_version(version)
+    return version
+
+@st.cache_data(persist="disk", show_spinner=False)
+def get_catalog_and_filter_options(dataset_version):
+    results = fetch_concurrently([(fetch_catalog, ()), (fetch_filter_options, ())])
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
+    return tuple(results)
+
+def view_panels(view, state=None, breakdown_by_gender=False, grouping="PN_EMPSIT"):
+    """The /bundle panel specs one view needs"""
+    if view == "satisfaction":
+        panels = [
+            {"panel": "burnout", "params": {"with_se": True}},
+            {"panel": "satisfaction", "params": {"breakdown_by_gender": breakdown_by_gender, "with_se": True}},
+        ]
+        # The map needs every state; a single state gets the rural/urban breakdown instead
+        if state:
+            panels.append({"panel": "satisfaction_by_rural_urban", "params": {"with_se": True}})
+        else:
+            panels.append({"panel": "satisfaction_by_state"})
+        return panels
+    if view == "earnings":
+        return [{"panel": "earnings", "params": {"grouping": grouping}}]
+    return [
+        {"panel": "telehealth", "params": {"with_se": True}},
+        {"panel": "telehealth_by_nurse_type", "params": {"with_se": True}},
+        {"panel": "telehealth_by_gender", "params": {"with_se": True}},
+    ]
+
+@st.cache_data(persist="disk", show_spinner=False)
+def get_panels(dataset_version, view, state=None, **params):
+    """
+    The panels of the view being shown, one /bundle request per panel sent concurrently,
+    so the view waits for its slowest panel rather than all of them in turn.
+    Returns ({panel: DataFrame}, {panel: error the API reported}).
+    """
+    calls = [(fetch_bundle, (state, [spec])) for spec in view_panels(view, state, **params)]
+    frames = {}
+    errors = {}
+    for data in fetch_concurrently(calls):
+        if isinstance(data, Exception):
+            raise data
+        errors.update(data['errors'])
+        frames.update(data['panels'])
+    return frames, errors
+
+def load_panels(view, state=None, **params):
+    """get_panels() for the current dataset version, reporting failures on the page"""
     try:
-        resp = requests.get(f"{API_URL}/satisfaction/by_rural_urban", params=params)
-        if resp.status_code == 200:
-            data = resp.json()
-            if data:
-                return pd.DataFrame(data)
+        frames, errors = get_panels(get_dataset_version(), view, state, **params)
     except Exception as e:
-        st.error(f"Failed to fetch satisfaction by rural/urban: {e}")
-    return pd.DataFrame()
+        st.error(f"Failed to fetch dashboard data: {e}")
+        return {}
+    for key, detail in errors.items():
+        st.error(f"Failed to fetch {key}: {detail}")
+    return frames
 
 # Mappings
-BURNOUT_MAP = {1.0: "Yes", 2.0: "No"}
-SATISFACTION_MAP = {
+# Value labels come from the SAS catalog served by the API; the maps below are only
+# used when the catalog has no format for a variable
+try:
+    CATALOG, options = get_catalog_and_filter_options(get_dataset_version())
+except Exception as e:
+    st.error(f"Failed to connect to API: {e}")
+    CATALOG, options = {"labels": {}, "value_labels": {}}, {"states": [], "work_settings": []}
+
+def label_map(name, fallback):
+    pairs = CATALOG['value_labels'].get(name)
+    if pairs:
+        return {code: label for code, label in pairs}
+    return fallback
+
+def format_pct(df):
+    """Percentage labels for tooltips, with the 95% CI when the API returned standard errors"""
+    if 'percentage_ci_lower' not in df:
+        return df['percentage'].apply(lambda x: f"{x:.1f}%")
+    return df.apply(lambda r: f"{r['percentage']:.1f}% (95% CI {r['percentage_ci_lower']:.1f}-{r['percentage_ci_upper']:.1f})", axis=1)
+
+BURNOUT_MAP = label_map('PN_BURNOUT', {1.0: "Yes", 2.0: "No"})
+SATISFACTION_MAP = label_map('PN_SATISFD', {
     1.0: "Extremely Satisfied", 
     2.0: "Moderately Satisfied", 
     3.0: "Moderately Dissatisfied", 
     4.0: "Extremely Dissatisfied"
-}
-TELEHEALTH_MAP = {1.0: "Yes", 2.0: "No"}
-SEX_MAP = {1.0: "Male", 2.0: "Female"}
-NURSE_TYPE_MAP = {1.0: "Nurse Practitioner (NP)", 2.0: "Registered Nurse (RN)"}
-RURAL_MAP = {1.0: "Rural", 2.0: "Urban"}
+})
+TELEHEALTH_MAP = label_map('PN_TELHLTH', {1.0: "Yes", 2.0: "No"})
+SEX_MAP = label_map('SEX', {1.0: "Male", 2.0: "Female"})
+NURSE_TYPE_MAP = label_map('APN_NP', {1.0: "Nurse Practitioner (NP)", 2.0: "Registered Nurse (RN)"})
+RURAL_MAP = label_map('RN_RURAL', {1.0: "Rural", 2.0: "Urban"})
 
-EMPSIT_MAP = {
+EMPSIT_MAP = label_map('PN_EMPSIT', {
     1.0: "Employment Agency",
     2.0: "Organization/Facility",
     3.0: "Self-Employed"
-}
+})
 
-AGE_MAP = {
+AGE_MAP = label_map('AGE_GP_PUF', {
     1.0: "<=29",
     2.0: "30-34",
     3.0: "35-39",
@@ -148,35 +236,63 @@ AGE_MAP = {
     9.0: "65-69",
     10.0: "70-74",
     11.0: ">= 75"
-}
+})
 
-EDU_MAP = {
+EDU_MAP = label_map('HIGHEDU_PUF', {
     1.0: "Diploma",
     2.0: "Associate",
     3.0: "Bachelor",
     4.0: "Master/Post-Master",
     5.0: "Doctorate"
-}
+})
+
+@st.cache_resource
+def get_state_base_map():
+    """
+    The projected US states layer both choropleths draw on, built once per process.
+    Each map adds its own colour encoding and lookup; Altair methods return copies.
+    """
+    if not os.path.exists(STATES_TOPOJSON):
+        raise FileNotFoundError(f"{STATES_TOPOJSON} is missing; build it with: python3 states_topojson.py")
+    with open(STATES_TOPOJSON) as f:
+        states = alt.InlineData(values=json.load(f), format=alt.DataFormat(type='topojson', feature='states'))
+    return alt.Chart(states).mark_geoshape(stroke='white', strokeWidth=0.5).project(
+        type='albersUsa'
+    ).properties(
+        width=400,
+        height=300
+    )
 
 # Sidebar
-options = get_filter_options()
 state_filter = st.sidebar.selectbox("Filter by State", ["All"] + options['states'])
 selected_state = None if state_filter == "All" else state_filter
 
-# Layout
-tab1, tab2, tab3 = st.tabs(["Burnout & Satisfaction", "Education & Earnings", "Telehealth"])
+group_map = {
+    "Work Setting (PN_EMPSIT)": "PN_EMPSIT",
+    "Age Group (AGE_GP_PUF)": "AGE_GP_PUF", 
+    "Degree (HIGHEDU_PUF)": "HIGHEDU_PUF",
+    "Gender (SEX)": "SEX"
+}
+
+# Views
+# Only the selected view runs: its panels are fetched and its charts built on demand.
+# Each view is a fragment, so its own widgets rerun just that view.
+@st.fragment
+def satisfaction_view(selected_state):
+    # The gender checkbox is rendered below the burnout chart, but its current value is
+    # in session state already, so all of the view's panels are requested up front
+    panels = load_panels("satisfaction", selected_state, breakdown_by_gender=st.session_state.get("show_gender", False))
 
-with tab1:
     st.header("Burnout Levels")
-    df_burnout = get_burnout(selected_state)
+    df_burnout = panels.get('burnout', pd.DataFrame())
     
     if not df_burnout.empty:
         # Map labels
         df_burnout['label'] = df_burnout['category'].map(BURNOUT_MAP).fillna(df_burnout['category'].astype(str))
-        df_burnout['pct_fmt'] = df_burnout['percentage'].apply(lambda x: f"{x:.1f}%")
+        df_burnout['pct_fmt'] = format_pct(df_burnout)
         
         chart = alt.Chart(df_burnout).mark_bar().encode(
-            x=alt.X('label:O', title='Burnout Level', sort=["Yes", "No"]),
+            x=alt.X('label:O', title='Burnout Level', sort=list(BURNOUT_MAP.values())),
             y=alt.Y('percentage:Q', title='Percentage (%)'),
             color=alt.Color('label:N', legend=alt.Legend(title="Burnout"), scale=alt.Scale(range=[UT_ORANGE, UT_BLUE])),
             tooltip=['label', alt.Tooltip('pct_fmt', title='Percentage'), alt.Tooltip('weighted_count', format=',.0f', title='Weighted Count')]
@@ -192,14 +308,14 @@ with tab1:
     st.header("Job Satisfaction")
     
     # Toggle for gender breakdown
-    show_gender = st.checkbox("Breakdown by Gender", value=False)
+    show_gender = st.checkbox("Breakdown by Gender", value=False, key="show_gender")
     
-    df_sat = get_satisfaction_v2(selected_state, breakdown_by_gender=show_gender)
+    df_sat = panels.get('satisfaction', pd.DataFrame())
     
     if not df_sat.empty:
         df_sat['label'] = df_sat['category'].map(SATISFACTION_MAP).fillna(df_sat['category'].astype(str))
-        df_sat['pct_fmt'] = df_sat['percentage'].apply(lambda x: f"{x:.1f}%")
-        site_sort = ["Extremely Satisfied", "Moderately Satisfied", "Moderately Dissatisfied", "Extremely Dissatisfied"]
+        df_sat['pct_fmt'] = format_pct(df_sat)
+        site_sort = list(SATISFACTION_MAP.values())
         
         if show_gender:
             # Map Gender
@@ -233,36 +349,11 @@ with tab1:
         st.subheader("Satisfaction by State - US Map")
         st.write("Geographic distribution of extreme satisfaction levels across the United States")
         
-        df_state_sat = get_satisfaction_by_state()
+        df_state_sat = panels.get('satisfaction_by_state', pd.DataFrame())
         
         if not df_state_sat.empty:
-            # State abbreviation to FIPS code mapping
-            state_fips = {
-                'AL': 1, 'AK': 2, 'AZ': 4, 'AR': 5, 'CA': 6, 'CO': 8, 'CT': 9, 'DE': 10, 'FL': 12, 'GA': 13,
-                'HI': 15, 'ID': 16, 'IL': 17, 'IN': 18, 'IA': 19, 'KS': 20, 'KY': 21, 'LA': 22, 'ME': 23, 'MD': 24,
-                'MA': 25, 'MI': 26, 'MN': 27, 'MS': 28, 'MO': 29, 'MT': 30, 'NE': 31, 'NV': 32, 'NH': 33, 'NJ': 34,
-                'NM': 35, 'NY': 36, 'NC': 37, 'ND': 38, 'OH': 39, 'OK': 40, 'OR': 41, 'PA': 42, 'RI': 44, 'SC': 45,
-                'SD': 46, 'TN': 47, 'TX': 48, 'UT': 49, 'VT': 50, 'VA': 51, 'WA': 53, 'WV': 54, 'WI': 55, 'WY': 56,
-                'DC': 11
-            }
-            
-            # State abbreviation to full name mapping
-            state_names = {
-                'AL': 'Alabama', 'AK': 'Alaska', 'AZ': 'Arizona', 'AR': 'Arkansas', 'CA': 'California', 
-                'CO': 'Colorado', 'CT': 'Connecticut', 'DE': 'Delaware', 'FL': 'Florida', 'GA': 'Georgia',
-                'HI': 'Hawaii', 'ID': 'Idaho', 'IL': 'Illinois', 'IN': 'Indiana', 'IA': 'Iowa', 
-                'KS': 'Kansas', 'KY': 'Kentucky', 'LA': 'Louisiana', 'ME': 'Maine', 'MD': 'Maryland',
-                'MA': 'Massachusetts', 'MI': 'Michigan', 'MN': 'Minnesota', 'MS': 'Mississippi', 'MO': 'Missouri', 
-                'MT': 'Montana', 'NE': 'Nebraska', 'NV': 'Nevada', 'NH': 'New Hampshire', 'NJ': 'New Jersey',
-                'NM': 'New Mexico', 'NY': 'New York', 'NC': 'North Carolina', 'ND': 'North Dakota', 'OH': 'Ohio', 
-                'OK': 'Oklahoma', 'OR': 'Oregon', 'PA': 'Pennsylvania', 'RI': 'Rhode Island', 'SC': 'South Carolina',
-                'SD': 'South Dakota', 'TN': 'Tennessee', 'TX': 'Texas', 'UT': 'Utah', 'VT': 'Vermont', 
-                'VA': 'Virginia', 'WA': 'Washington', 'WV': 'West Virginia', 'WI': 'Wisconsin', 'WY': 'Wyoming',
-                'DC': 'District of Columbia'
-            }
-            
             # Filter out invalid state codes
-            df_state_sat = df_state_sat[df_state_sat['state'].isin(state_fips.keys())].copy()
+            df_state_sat = df_state_sat[df_state_sat['state'].isin(STATE_FIPS.keys())].copy()
             
             # Filter for Extremely Satisfied (1) and Extremely Dissatisfied (4)
             df_extreme = df_state_sat[df_state_sat['satisfaction_level'].isin([1.0, 4.0])].copy()
@@ -272,57 +363,51 @@ with tab1:
             df_extremely_dissatisfied = df_extreme[df_extreme['satisfaction_level'] == 4.0][['state', 'percentage']].copy()
             
             # Add FIPS codes to dataframes
-            df_extremely_satisfied['id'] = df_extremely_satisfied['state'].map(state_fips)
-            df_extremely_dissatisfied['id'] = df_extremely_dissatisfied['state'].map(state_fips)
+            df_extremely_satisfied['id'] = df_extremely_satisfied['state'].map(STATE_FIPS)
+            df_extremely_dissatisfied['id'] = df_extremely_dissatisfied['state'].map(STATE_FIPS)
             
-            # Load US states geography
-            us_states = alt.topo_feature('https://cdn.jsdelivr.net/npm/us-atlas@3/states-10m.json', 'states')
+            try:
+                base_map = get_state_base_map()
+            except FileNotFoundError as e:
+                st.error(f"Cannot draw the state maps: {e}")
+                base_map = None
             
-            col1, col2 = st.columns(2)
+            if base_map is not None:
+                col1, col2 = st.columns(2)
             
-            with col1:
-                st.write("**Extremely Satisfied**")
-                if not df_extremely_satisfied.empty:
-                    map_satisfied = alt.Chart(us_states).mark_geoshape(stroke='white', strokeWidth=0.5).encode(
-                        color=alt.Color('percentage:Q', 
-                                        scale=alt.Scale(scheme='oranges', domain=[0, df_extremely_satisfied['percentage'].max()]),
-                                        legend=alt.Legend(title='% Extremely Satisfied', format='.1f')),
-                        tooltip=[alt.Tooltip('state:N', title='State'), 
-                                 alt.Tooltip('percentage:Q', title='Percentage', format='.1f')]
-                    ).transform_lookup(
-                        lookup='id',
-                        from_=alt.LookupData(df_extremely_satisfied, key='id', fields=['state', 'percentage'])
-                    ).project(
-                        type='albersUsa'
-                    ).properties(
-                        width=400,
-                        height=300
-                    )
-                    st.altair_chart(map_satisfied, use_container_width=True)
-                else:
-                    st.info("No data available")
+                with col1:
+                    st.write("**Extremely Satisfied**")
+                    if not df_extremely_satisfied.empty:
+                        map_satisfied = base_map.encode(
+                            color=alt.Color('percentage:Q', 
+                                            scale=alt.Scale(scheme='oranges', domain=[0, df_extremely_satisfied['percentage'].max()]),
+                                            legend=alt.Legend(title='% Extremely Satisfied', format='.1f')),
+                            tooltip=[alt.Tooltip('state:N', title='State'), 
+                                     alt.Tooltip('percentage:Q', title='Percentage', format='.1f')]
+                        ).transform_lookup(
+                            lookup='id',
+                            from_=alt.LookupData(df_extremely_satisfied, key='id', fields=['state', 'percentage'])
+                        )
+                        st.altair_chart(map_satisfied, use_container_width=True)
+                    else:
+                        st.info("No data available")
             
-            with col2:
-                st.write("**Extremely Dissatisfied**")
-                if not df_extremely_dissatisfied.empty:
-                    map_dissatisfied = alt.Chart(us_states).mark_geoshape(stroke='white', strokeWidth=0.5).encode(
-                        color=alt.Color('percentage:Q', 
-                                        scale=alt.Scale(scheme='blues', domain=[0, df_extremely_dissatisfied['percentage'].max()]),
-                                        legend=alt.Legend(title='% Extremely Dissatisfied', format='.1f')),
-                        tooltip=[alt.Tooltip('state:N', title='State'), 
-                                 alt.Tooltip('percentage:Q', title='Percentage', format='.1f')]
-                    ).transform_lookup(
-                        lookup='id',
-                        from_=alt.LookupData(df_extremely_dissatisfied, key='id', fields=['state', 'percentage'])
-                    ).project(
-                        type='albersUsa'
-                    ).properties(
-                        width=400,
-                        height=300
-                    )
-                    st.altair_chart(map_dissatisfied, use_container_width=True)
-                else:
-                    st.info("No data available")
+                with col2:
+                    st.write("**Extremely Dissatisfied**")
+                    if not df_extremely_dissatisfied.empty:
+                        map_dissatisfied = base_map.encode(
+                            color=alt.Color('percentage:Q', 
+                                            scale=alt.Scale(scheme='blues', domain=[0, df_extremely_dissatisfied['percentage'].max()]),
+                                            legend=alt.Legend(title='% Extremely Dissatisfied', format='.1f')),
+                            tooltip=[alt.Tooltip('state:N', title='State'), 
+                                     alt.Tooltip('percentage:Q', title='Percentage', format='.1f')]
+                        ).transform_lookup(
+                            lookup='id',
+                            from_=alt.LookupData(df_extremely_dissatisfied, key='id', fields=['state', 'percentage'])
+                        )
+                        st.altair_chart(map_dissatisfied, use_container_width=True)
+                    else:
+                        st.info("No data available")
             
             # KPI Cards - Top States
             st.divider()
@@ -332,7 +417,7 @@ with tab1:
                 if not df_extremely_satisfied.empty:
                     top_satisfied = df_extremely_satisfied.loc[df_extremely_satisfied['percentage'].idxmax()]
                     state_abbr = top_satisfied['state']
-                    state_full_name = state_names.get(state_abbr, state_abbr)
+                    state_full_name = STATE_NAMES.get(state_abbr, state_abbr)
                     st.markdown(f"""
                     <div style="background: linear-gradient(135deg, {UT_ORANGE}15 0%, {UT_ORANGE}05 100%); 
                                 border-left: 4px solid {UT_ORANGE}; 
@@ -349,7 +434,7 @@ with tab1:
                 if not df_extremely_dissatisfied.empty:
                     top_dissatisfied = df_extremely_dissatisfied.loc[df_extremely_dissatisfied['percentage'].idxmax()]
                     state_abbr = top_dissatisfied['state']
-                    state_full_name = state_names.get(state_abbr, state_abbr)
+                    state_full_name = STATE_NAMES.get(state_abbr, state_abbr)
                     st.markdown(f"""
                     <div style="background: linear-gradient(135deg, {UT_BLUE}15 0%, {UT_BLUE}05 100%); 
                                 border-left: 4px solid {UT_BLUE}; 
@@ -368,7 +453,7 @@ with tab1:
         st.subheader(f"Satisfaction in {selected_state} - Rural vs Urban")
         st.write(f"Comparing extreme satisfaction levels between rural and urban nurses in {selected_state}")
         
-        df_rural_sat = get_satisfaction_by_rural_urban(selected_state)
+        df_rural_sat = panels.get('satisfaction_by_rural_urban', pd.DataFrame())
         
         if not df_rural_sat.empty:
             # Filter for Extremely Satisfied (1) and Extremely Dissatisfied (4)
@@ -377,7 +462,7 @@ with tab1:
             # Map area types
             df_extreme['area_label'] = df_extreme['area_type'].map(RURAL_MAP).fillna(df_extreme['area_type'].astype(str))
             df_extreme['satisfaction_label'] = df_extreme['satisfaction_level'].map(SATISFACTION_MAP)
-            df_extreme['pct_fmt'] = df_extreme['percentage'].apply(lambda x: f"{x:.1f}%")
+            df_extreme['pct_fmt'] = format_pct(df_extreme)
             
             # Prepare data for charts
             df_extremely_satisfied = df_extreme[df_extreme['satisfaction_level'] == 1.0].copy()
@@ -480,18 +565,13 @@ with tab1:
         else:
             st.info(f"No rural/urban satisfaction data available for {selected_state}.")
 
-with tab2:
+@st.fragment
+def earnings_view(selected_state):
     st.header("Earnings Analysis")
-    grouping = st.radio("Group By", ["Work Setting (PN_EMPSIT)", "Age Group (AGE_GP_PUF)", "Degree (HIGHEDU_PUF)", "Gender (SEX)"], horizontal=True)
+    grouping = st.radio("Group By", list(group_map), horizontal=True, key="earnings_grouping")
     
-    group_map = {
-        "Work Setting (PN_EMPSIT)": "PN_EMPSIT",
-        "Age Group (AGE_GP_PUF)": "AGE_GP_PUF", 
-        "Degree (HIGHEDU_PUF)": "HIGHEDU_PUF",
-        "Gender (SEX)": "SEX"
-    }
-    
-    df_earn = get_earnings(selected_state, group_map[grouping])
+    panels = load_panels("earnings", selected_state, grouping=group_map[grouping])
+    df_earn = panels.get('earnings', pd.DataFrame())
     
     if not df_earn.empty:
         # Apply Gender Map if selected
@@ -529,13 +609,15 @@ with tab2:
     else:
         st.info("No data available.")
 
-with tab3:
+@st.fragment
+def telehealth_view(selected_state):
     st.header("Telehealth Adoption")
-    df_tel = get_telehealth(selected_state)
+    panels = load_panels("telehealth", selected_state)
+    df_tel = panels.get('telehealth', pd.DataFrame())
     
     if not df_tel.empty:
         df_tel['label'] = df_tel['category'].map(TELEHEALTH_MAP).fillna(df_tel['category'].astype(str))
-        df_tel['pct_fmt'] = df_tel['percentage'].apply(lambda x: f"{x:.1f}%")
+        df_tel['pct_fmt'] = format_pct(df_tel)
         
         chart = alt.Chart(df_tel).mark_arc(innerRadius=50).encode(
             theta=alt.Theta(field="percentage", type="quantitative"),
@@ -553,11 +635,11 @@ with tab3:
     st.subheader("Telehealth Users by Nurse Type")
     st.write("Among nurses who use telehealth, breakdown by RN vs NP")
     
-    df_nurse_type = get_telehealth_by_nurse_type(selected_state)
+    df_nurse_type = panels.get('telehealth_by_nurse_type', pd.DataFrame())
     
     if not df_nurse_type.empty:
         df_nurse_type['label'] = df_nurse_type['nurse_type'].map(NURSE_TYPE_MAP).fillna(df_nurse_type['nurse_type'].astype(str))
-        df_nurse_type['pct_fmt'] = df_nurse_type['percentage'].apply(lambda x: f"{x:.1f}%")
+        df_nurse_type['pct_fmt'] = format_pct(df_nurse_type)
         
         chart_nurse = alt.Chart(df_nurse_type).mark_bar().encode(
             x=alt.X('label:O', title='Nurse Type'),
@@ -576,11 +658,11 @@ with tab3:
     st.subheader("Telehealth Users by Gender")
     st.write("Among nurses who use telehealth, breakdown by gender")
     
-    df_gender = get_telehealth_by_gender(selected_state)
+    df_gender = panels.get('telehealth_by_gender', pd.DataFrame())
     
     if not df_gender.empty:
         df_gender['label'] = df_gender['gender'].map(SEX_MAP).fillna(df_gender['gender'].astype(str))
-        df_gender['pct_fmt'] = df_gender['percentage'].apply(lambda x: f"{x:.1f}%")
+        df_gender['pct_fmt'] = format_pct(df_gender)
         
         chart_gender = alt.Chart(df_gender).mark_bar().encode(
             x=alt.X('label:O', title='Gender'),
@@ -593,6 +675,19 @@ with tab3:
     else:
         st.info("No data available.")
 
+views = {
+    "Burnout & Satisfaction": satisfaction_view,
+    "Education & Earnings": earnings_view,
+    "Telehealth": telehealth_view,
+}
+# Streamlit drops the state of widgets that are not rendered; re-assigning it keeps the
+# hidden views' selections when switching back to them
+for key in ("show_gender", "earnings_grouping"):
+    if key in st.session_state:
+        st.session_state[key] = st.session_state[key]
+view = st.radio("View", list(views), horizontal=True, key="view", label_visibility="collapsed")
+views[view](selected_state)
+
 # Footer
 st.divider()
 from datetime import datetime
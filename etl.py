@@ -1,7 +1,17 @@
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import sqlite3
 import re
 import os
+import time
+import argparse
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+from sas_schema import load_catalog, catalog_to_json, file_hash
 
 # Project Paths
 BASE_DIR = '/Users/andyburnett/Library/Mobile Documents/com~apple~CloudDocs/Desktop/X03.27.25/Coding_Practice/projects/nursing_workforce'
@@ -9,102 +19,471 @@ DATA_DIR = os.path.join(BASE_DIR, '2022_NSSRN_PUF_ASCII_Package')
 SAS_FILE = os.path.join(DATA_DIR, 'nssrn_2022_puf_flat.sas')
 TXT_FILE = os.path.join(DATA_DIR, 'nssrn_2022_puf_flat.txt')
 DB_FILE = os.path.join(BASE_DIR, 'nursing.db')
+PARQUET_FILE = os.path.join(BASE_DIR, 'nursing.parquet')
+
+# Bump when the layout or column types the loader writes to nssrn change, forcing a reload
+SCHEMA_VERSION = 1
+
+# 'L' and 'M' are missing values per SAS script
+MISSING_TOKENS = [b'', b'L', b'M', b'.']
+CHUNK_SIZE = 10000
+
+# Final weight RKRNWGTA plus the replicate weights RKRNWGT1..RKRNWGT80
+WEIGHT_PATTERN = re.compile(r'^RKRNWGT(A|\d+)$')
+
+# Columns the API reads; copied into the narrow "analytics" table after each load
+ANALYTICS_COLUMNS = [
+    'STATE_PUF', 'PN_TELHLTH', 'PN_BURNOUT', 'PN_SATISFD', 'SEX', 'RN_RURAL', 'APN_NP',
+    'PN_EMPSIT', 'AGE_GP_PUF', 'HIGHEDU_PUF', 'PN_EARN_PUF', 'RKRNWGTA',
+]
+
+# Covering indexes: each one holds every column its endpoints touch, so a state filter
+# is an index seek that never visits the table rows
+ANALYTICS_INDEXES = {
+    'idx_analytics_burnout': ['STATE_PUF', 'PN_BURNOUT', 'RKRNWGTA'],
+    'idx_analytics_satisfaction': ['STATE_PUF', 'PN_SATISFD', 'SEX', 'RN_RURAL', 'RKRNWGTA'],
+    'idx_analytics_telehealth': ['STATE_PUF', 'PN_TELHLTH', 'APN_NP', 'SEX', 'RKRNWGTA'],
+    'idx_analytics_telehealth_users': ['PN_TELHLTH', 'STATE_PUF', 'APN_NP', 'SEX', 'RKRNWGTA'],
+    'idx_analytics_earnings': [
+        'STATE_PUF', 'PN_EMPSIT', 'AGE_GP_PUF', 'HIGHEDU_PUF', 'SEX', 'PN_EARN_PUF', 'RKRNWGTA'
+    ],
+}
+
+# Weighted aggregates precomputed into agg_cube for every state plus the nation ('ALL'):
+# each outcome alone, each outcome by each dimension, and each dimension alone
+CUBE_OUTCOMES = ['PN_BURNOUT', 'PN_SATISFD', 'PN_TELHLTH']
+CUBE_DIMENSIONS = ['SEX', 'RN_RURAL', 'APN_NP', 'PN_EMPSIT', 'AGE_GP_PUF', 'HIGHEDU_PUF']
+CUBE_PAIRS = (
+    [(outcome, '') for outcome in CUBE_OUTCOMES]
+    + [(outcome, dimension) for outcome in CUBE_OUTCOMES for dimension in CUBE_DIMENSIONS]
+    + [(dimension, '') for dimension in CUBE_DIMENSIONS]
+)
+NATIONAL = 'ALL'
+
+# The load can simply be rerun if it dies, so skip fsyncs and keep the journal in memory
+BULK_LOAD_PRAGMAS = {
+    'journal_mode': 'MEMORY',
+    'synchronous': 'OFF',
+    'cache_size': -262144,  # KiB, i.e. 256 MB
+}
+
+def map_records(txt_file):
+    """
+    Memory-maps the fixed-width text file as a (records x record_length) byte matrix.
+    Every record has the same length, so each row is one survey response and each
+    SAS column range is a plain column slice of the matrix.
+    Returns (records, last): the matrix of newline-terminated records, a view of the map,
+    and the final record padded to full length when the file does not end in a newline
+    (None otherwise). Use slice_records to take rows across both.
+    """
+    with open(txt_file, 'rb') as f:
+        stride = len(f.readline())
+    if stride == 0:
+        return np.empty((0, 0), dtype=np.uint8), None
+
+    data = np.memmap(txt_file, dtype=np.uint8, mode='r')
+
+    nrows, tail = divmod(data.size, stride)
+    records = data[:nrows * stride].reshape(nrows, stride)
+    last = None
+    if tail:
+        # Last record has no trailing newline: pad a copy of it alone, appending it to the
+        # whole matrix would copy the entire file out of the map
+        last = np.full((1, stride), ord(' '), dtype=np.uint8)
+        last[0, :tail] = data[nrows * stride:]
+        last[0, -1] = ord('\n')
+
+    if not (records[:, -1] == ord('\n')).all():
+        raise ValueError(f"{txt_file} does not have fixed-length records")
+    return records, last
+
+def record_count(records, last):
+    return len(records) + (last is not None)
+
+def slice_records(records, last, start=0, stop=None):
+    """
+    Records [start, stop) as one byte matrix. It is a view of the memory map unless the
+    range takes in an unterminated last record, which is then appended to this slice only.
+    """
+    if last is None or (stop is not None and stop <= len(records)):
+        return records[start:stop]
+    return np.concatenate([records[start:], last])
+
+def parse_field(raw, var=None):
+    """
+    Converts one column of raw fixed-width bytes into values. 'L', 'M', '.' and blanks become nulls.
+    With a typed schema entry: character columns stay text, weights become float64 and
+    coded items become the smallest integer type their field width allows.
+    Without one, types are inferred the way read_fwf would.
+    """
+    values = np.char.strip(raw)
+    missing = np.isin(values, MISSING_TOKENS)
+
+    if var is not None and var.get('type') == 'char':
+        return _to_strings(values, missing)
+
+    try:
+        numbers = np.where(missing, b'nan', values).astype(np.float64)
+    except ValueError:
+        return _to_strings(values, missing)
+
+    has_decimals = np.char.count(values[~missing], b'.').any()
+    if var is not None:
+        if has_decimals or WEIGHT_PATTERN.match(var['name']):
+            return numbers
+        return pd.array(numbers, dtype=integer_dtype(var['width']))
 
-def parse_sas_schema(sas_file_path):
-    """
-    Parses the SAS input statement to get variable names and column specifications.
-    Returns: list of tuples (col_name, start_col, end_col) and list of (col_name, width)
-    """
-    variables = []
-    
-    with open(sas_file_path, 'r') as f:
-        lines = f.readlines()
-        
-    # Find the data step and input section
-    in_input = False
-    
-    # Regex to span potential multi-line input or flexible whitespace
-    # Looking for lines like:  ADDLANG 1-1
-    # or  CNTRLNUM $31-40
-    pattern = re.compile(r'^\s*(\w+)\s+\$?(\d+)-(\d+)')
-    
-    for line in lines:
-        line = line.strip()
-        if line.lower().startswith('input'):
-            in_input = True
-            continue
-        if line.strip() == ';':
-            in_input = False
-            
-        if in_input:
-            match = pattern.match(line)
-            if match:
-                var_name = match.group(1)
-                start_col = int(match.group(2))
-                end_col = int(match.group(3))
-                variables.append({
-                    'name': var_name,
-                    'start': start_col,
-                    'end': end_col
-                })
-    
-    return variables
-
-def load_data(variables):
-    """
-    Reads the fixed-width text file using the parsed schema.
-    """
-    # Calculate widths for pandas read_fwf
-    # pandas colspecs takes (start, end) where start is inclusive, end is exclusive (0-based)
-    # SAS uses 1-based indexing inclusive
-    
-    colspecs = []
-    names = []
-    dtype_map = {}
-    
+    # read_fwf keeps whole-number columns as integers unless they have nulls
+    if not missing.any() and not has_decimals:
+        return numbers.astype(np.int64)
+    return numbers
+
+def _to_strings(values, missing):
+    strings = values.astype(str).astype(object)
+    strings[missing] = np.nan
+    return strings
+
+def integer_dtype(width):
+    """Smallest nullable integer type that holds any value of a numeric field this wide."""
+    if width <= 2:
+        return 'Int8'
+    if width <= 4:
+        return 'Int16'
+    if width <= 9:
+        return 'Int32'
+    return 'Int64'
+
+def parse_records(records, variables):
+    """
+    Slices every variable out of a record matrix by its SAS start/end offsets.
+    Column types follow the schema when it carries them, otherwise they match pd.read_fwf.
+    """
+    columns = {}
     for var in variables:
-        # SAS: 1 to 1 -> Pandas: 0 to 1
-        # SAS: 2 to 3 -> Pandas: 1 to 3
+        # SAS uses 1-based inclusive columns: SAS 2-3 -> bytes [1:3]
         start = var['start'] - 1
         end = var['end']
-        colspecs.append((start, end))
-        names.append(var['name'])
-        
-        # We'll read everything as string first to handle 'L', 'M' missing values correctly, 
-        # or rely on pandas na_values.
-        # But 'CNTRLNUM' should definitely be string. Others can be inferred later or cleaned.
-        # Let's try letting pandas infer types but specifying na_values
-        
+        width = end - start
+        raw = np.ascontiguousarray(records[:, start:end]).view(f'S{width}').ravel()
+        columns[var['name']] = parse_field(raw, var if 'type' in var else None)
+    return pd.DataFrame(columns, index=pd.RangeIndex(len(records)))
+
+def project(variables, columns):
+    """Keeps only the schema entries for the given column names (all of them if columns is None)."""
+    if columns is None:
+        return variables
+    missing = set(columns) - {var['name'] for var in variables}
+    if missing:
+        raise KeyError(f"Unknown variables: {sorted(missing)}")
+    return [var for var in variables if var['name'] in columns]
+
+def read_fixed_width(txt_file, variables, nrows=None, columns=None):
+    """
+    Reads the fixed-width text file into a DataFrame.
+    nrows: optional integer to limit the number of records read
+    columns: optional list of variable names; only their byte ranges are parsed
+    """
+    records, last = map_records(txt_file)
+    return parse_records(slice_records(records, last, stop=nrows), project(variables, columns))
+
+def iter_fixed_width(txt_file, variables, columns=None, chunksize=CHUNK_SIZE):
+    """
+    Streams the fixed-width text file as DataFrames of at most chunksize records,
+    parsing only the requested columns, so memory stays flat regardless of file size.
+    """
+    records, last = map_records(txt_file)
+    variables = project(variables, columns)
+    for offset in range(0, record_count(records, last), chunksize):
+        yield parse_records(slice_records(records, last, offset, offset + chunksize), variables)
+
+def sqlite_type(var):
+    """Declared SQLite column type for a schema entry."""
+    if var.get('type') == 'char':
+        return 'TEXT'
+    if WEIGHT_PATTERN.match(var['name']):
+        return 'REAL'
+    return 'INTEGER'
+
+def parse_chunk(txt_file, variables, start, stop):
+    """
+    Parses records [start, stop) into plain row tuples ready for executemany.
+    Runs in a worker process, so it maps the file itself instead of receiving the bytes.
+    """
+    records, last = map_records(txt_file)
+    chunk = parse_records(slice_records(records, last, start, stop), variables)
+    columns = []
+    for name in chunk.columns:
+        values = chunk[name].to_numpy(dtype=object, na_value=None)
+        columns.append(values.tolist())
+    return list(zip(*columns))
+
+def load_data(variables, workers=1):
+    """
+    Reads the fixed-width text file using the parsed schema and bulk loads it into SQLite.
+    workers: number of processes parsing chunks in parallel; a single writer inserts
+    every chunk inside one transaction with journaling and fsync relaxed for the load.
+    """
     print(f"Detected {len(variables)} variables.")
-    
-    # 'L' and 'M' are missing values per SAS script
-    missing_values = ['L', 'M', ' ', '.'] 
-    
-    print("Reading text file... this might take a minute.")
-    df = pd.read_fwf(
-        TXT_FILE,
-        colspecs=colspecs,
-        names=names,
-        na_values=missing_values,
-        chunksize=10000 
-    )
-    
+
+    print("Reading text file...")
+    nrows = record_count(*map_records(TXT_FILE))
+    bounds = [(start, min(start + CHUNK_SIZE, nrows)) for start in range(0, nrows, CHUNK_SIZE)]
+
+    columns = ', '.join(f'"{var["name"]}" {sqlite_type(var)}' for var in variables)
+    insert = f"INSERT INTO nssrn VALUES ({', '.join('?' * len(variables))})"
+
+    conn = sqlite3.connect(DB_FILE, isolation_level=None)
+    saved_pragmas = {
+        pragma: conn.execute(f"PRAGMA {pragma}").fetchone()[0]
+        for pragma in ('journal_mode', 'synchronous', 'cache_size')
+    }
+    for pragma, value in BULK_LOAD_PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
+
+    started = time.perf_counter()
+    try:
+        conn.execute("BEGIN")
+        conn.execute("DROP TABLE IF EXISTS nssrn")
+        conn.execute(f"CREATE TABLE nssrn ({columns})")
+
+        with ProcessPoolExecutor(max_workers=workers) if workers > 1 else nullcontext() as pool:
+            if pool is None:
+                chunks = (parse_chunk(TXT_FILE, variables, start, stop) for start, stop in bounds)
+            else:
+                # Finite argument lists: with no bounds (an empty file) map yields nothing
+                starts = [start for start, _ in bounds]
+                stops = [stop for _, stop in bounds]
+                chunks = pool.map(parse_chunk, [TXT_FILE] * len(bounds), [variables] * len(bounds), starts, stops)
+            for chunk_num, rows in enumerate(chunks, start=1):
+                print(f"Processing chunk {chunk_num}/{len(bounds)}...")
+                conn.executemany(insert, rows)
+
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        for pragma, value in saved_pragmas.items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        conn.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"Data loading complete: {nrows} rows in {elapsed:.1f}s ({nrows / max(elapsed, 1e-9):,.0f} rows/sec).")
+
+def build_analytics_tables():
+    """
+    Builds the narrow "analytics" projection of nssrn, ordered by state so each state's
+    rows sit together on disk, plus the covering indexes for the API's filters and groupings.
+    """
+    print("Building analytics table and indexes...")
     conn = sqlite3.connect(DB_FILE)
-    
-    chunk_num = 0
-    for chunk in df:
-        chunk_num += 1
-        print(f"Processing chunk {chunk_num}...")
-        chunk.to_sql('nssrn', conn, if_exists='append' if chunk_num > 1 else 'replace', index=False)
-        
+    with conn:
+        # One transaction, so API readers never see the table missing or half built
+        conn.execute("BEGIN")
+        conn.execute("DROP TABLE IF EXISTS analytics")
+        conn.execute(f"""
+            CREATE TABLE analytics AS
+            SELECT {', '.join(ANALYTICS_COLUMNS)}
+            FROM nssrn
+            ORDER BY STATE_PUF
+        """)
+        for name, columns in ANALYTICS_INDEXES.items():
+            conn.execute(f"CREATE INDEX {name} ON analytics ({', '.join(columns)})")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_nssrn_state ON nssrn (STATE_PUF)")
+    conn.execute("ANALYZE")
     conn.close()
-    print("Data loading complete.")
 
-if __name__ == "__main__":
+def build_aggregate_cube():
+    """
+    Materializes agg_cube: weighted counts and weighted earnings totals (earners only,
+    PN_EARN_PUF > 0) for every pair in CUBE_PAIRS, per state and nationally.
+    Rows with a null value in either variable of the pair are left out.
+    """
+    print("Building aggregate cube...")
+    conn = sqlite3.connect(DB_FILE)
+    with conn:
+        conn.execute("BEGIN")
+        conn.execute("DROP TABLE IF EXISTS agg_cube")
+        conn.execute("""
+            CREATE TABLE agg_cube (
+                state TEXT NOT NULL,
+                var_a TEXT NOT NULL,
+                value_a INTEGER NOT NULL,
+                var_b TEXT NOT NULL,
+                value_b INTEGER,
+                weighted_count REAL NOT NULL,
+                earn_weight REAL NOT NULL,
+                earn_weighted_sum REAL NOT NULL
+            )
+        """)
+        for var_a, var_b in CUBE_PAIRS:
+            value_b = var_b or 'NULL'
+            where_clause = f"WHERE {var_a} IS NOT NULL"
+            group_by = var_a
+            if var_b:
+                where_clause += f" AND {var_b} IS NOT NULL"
+                group_by += f", {var_b}"
+            aggregates = """
+                SUM(RKRNWGTA),
+                TOTAL(CASE WHEN PN_EARN_PUF > 0 THEN RKRNWGTA END),
+                TOTAL(CASE WHEN PN_EARN_PUF > 0 THEN PN_EARN_PUF * RKRNWGTA END)
+            """
+            conn.execute(f"""
+                INSERT INTO agg_cube
+                SELECT STATE_PUF, '{var_a}', {var_a}, '{var_b}', {value_b}, {aggregates}
+                FROM analytics
+                {where_clause} AND STATE_PUF IS NOT NULL
+                GROUP BY STATE_PUF, {group_by}
+            """)
+            conn.execute(f"""
+                INSERT INTO agg_cube
+                SELECT '{NATIONAL}', '{var_a}', {var_a}, '{var_b}', {value_b}, {aggregates}
+                FROM analytics
+                {where_clause}
+                GROUP BY {group_by}
+            """)
+        conn.execute("CREATE INDEX idx_agg_cube ON agg_cube (var_a, var_b, state)")
+    conn.close()
+
+def store_catalog(catalog):
+    """
+    Saves the SAS catalog (variables, labels and value formats) into nursing.db so the
+    API can serve it without access to the .sas file.
+    """
+    conn = sqlite3.connect(DB_FILE)
+    with conn:
+        conn.execute("BEGIN")
+        conn.execute("DROP TABLE IF EXISTS schema_catalog")
+        conn.execute("CREATE TABLE schema_catalog (sas_hash TEXT NOT NULL, catalog TEXT NOT NULL)")
+        conn.execute("INSERT INTO schema_catalog VALUES (?, ?)", (catalog['sas_hash'], catalog_to_json(catalog)))
+    conn.close()
+
+def write_columnar_store(variables):
+    """
+    Writes the PUF as a compressed Parquet file next to nursing.db, with one row group
+    per STATE_PUF so readers can skip every other state and load only the columns they need.
+    """
+    print("Writing columnar store...")
+    df = read_fixed_width(TXT_FILE, variables)
+    df = df.sort_values('STATE_PUF', kind='stable', na_position='last')
+
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    # Written beside the old file and renamed over it, so the API never reads a partial file
+    tmp_file = f"{PARQUET_FILE}.tmp"
+    try:
+        with pq.ParquetWriter(tmp_file, schema, compression='zstd') as writer:
+            for _, group in df.groupby('STATE_PUF', dropna=False, sort=False):
+                writer.write_table(pa.Table.from_pandas(group, schema=schema, preserve_index=False))
+        os.replace(tmp_file, PARQUET_FILE)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+    print(f"Columnar store written to {PARQUET_FILE}.")
+
+def read_metadata():
+    """Returns the etl_metadata key/value pairs recorded by the last run (empty if none)."""
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        return dict(conn.execute("SELECT key, value FROM etl_metadata"))
+    except sqlite3.OperationalError:
+        return {}
+    finally:
+        conn.close()
+
+def write_metadata(**values):
+    conn = sqlite3.connect(DB_FILE)
+    with conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS etl_metadata (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        conn.executemany("INSERT OR REPLACE INTO etl_metadata VALUES (?, ?)", [(k, str(v)) for k, v in values.items()])
+    conn.close()
+
+def table_exists(name):
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+    finally:
+        conn.close()
+
+def text_file_hash(metadata):
+    """
+    Content hash of the flat file. If its size and mtime match what the last run
+    recorded, the recorded hash is reused instead of re-reading the whole file.
+    """
+    stat = os.stat(TXT_FILE)
+    txt_stat = f"{stat.st_size}:{stat.st_mtime_ns}"
+    if metadata.get('txt_stat') == txt_stat and 'txt_hash' in metadata:
+        return metadata['txt_hash'], txt_stat
+    return file_hash(TXT_FILE), txt_stat
+
+def signature(*parts):
+    return hashlib.sha256(repr(parts).encode()).hexdigest()[:16]
+
+def run_etl(workers=1, force=False):
+    """
+    Loads the PUF and builds the derived artifacts, skipping every step whose inputs
+    are unchanged since the last run. The dataset version (hash of the flat file, the
+    .sas file and SCHEMA_VERSION) and a signature per derived artifact (dataset version
+    plus the artifact's definition) are kept in the etl_metadata table.
+    force: reload and rebuild everything regardless of the recorded state
+    """
     print("Parsing SAS schema...")
-    vars_list = parse_sas_schema(SAS_FILE)
+    catalog = load_catalog(SAS_FILE)
+    vars_list = catalog['variables']
     if not vars_list:
         print("Error: No variables found in SAS file. Check the Regex or file content.")
+        return
+
+    metadata = {} if force else read_metadata()
+    txt_hash, txt_stat = text_file_hash(metadata)
+    dataset_version = signature(txt_hash, catalog['sas_hash'], SCHEMA_VERSION)
+
+    if metadata.get('dataset_version') == dataset_version and table_exists('nssrn'):
+        print("Inputs unchanged since the last load, skipping nssrn.")
+        if metadata.get('txt_stat') != txt_stat:
+            write_metadata(txt_stat=txt_stat)
     else:
         print(f"Found {len(vars_list)} variables. Loading data...")
-        load_data(vars_list)
+        load_data(vars_list, workers=workers)
+        store_catalog(catalog)
+        write_metadata(
+            dataset_version=dataset_version,
+            txt_hash=txt_hash,
+            txt_stat=txt_stat,
+            sas_hash=catalog['sas_hash'],
+            schema_version=SCHEMA_VERSION,
+            loaded_at=time.strftime('%Y-%m-%dT%H:%M:%S')
+        )
+
+    analytics_signature = signature(dataset_version, ANALYTICS_COLUMNS, ANALYTICS_INDEXES)
+    if metadata.get('analytics_signature') == analytics_signature and table_exists('analytics'):
+        print("analytics is up to date, skipping.")
+    else:
+        build_analytics_tables()
+        write_metadata(analytics_signature=analytics_signature)
+
+    cube_signature = signature(analytics_signature, CUBE_PAIRS, NATIONAL)
+    if metadata.get('cube_signature') == cube_signature and table_exists('agg_cube'):
+        print("agg_cube is up to date, skipping.")
+    else:
+        build_aggregate_cube()
+        write_metadata(cube_signature=cube_signature)
+
+    parquet_signature = signature(dataset_version, PARQUET_FILE)
+    if metadata.get('parquet_signature') == parquet_signature and os.path.exists(PARQUET_FILE):
+        print("Columnar store is up to date, skipping.")
+    else:
+        write_columnar_store(vars_list)
+        write_metadata(parquet_signature=parquet_signature)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the NSSRN PUF into nursing.db")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="processes used to parse the flat file (default: all CPUs)")
+    parser.add_argument('--force', action='store_true',
+                        help="reload and rebuild everything even if the inputs are unchanged")
+    args = parser.parse_args()
+
+    run_etl(workers=args.workers, force=args.force)
@@ -1,12 +1,35 @@
 #!/bin/bash
 
-# Start the API server in the background
+# Embedded mode: the dashboard runs the API's query engine itself, no API server needed
+if [ "${NSSRN_EMBEDDED:-0}" = "1" ]; then
+    echo "Starting Streamlit dashboard (embedded engine)..."
+    exec streamlit run dashboard.py
+fi
+
+# Start the API server in the background, precomputing every result once it is up
 echo "Starting API server on port 8001..."
-python3 -m api.main &
+NSSRN_WARMUP=${NSSRN_WARMUP:-1} python3 -m api.main &
 API_PID=$!
 
-# Wait a moment for API to start
-sleep 3
+# Wait until the API reports its cache is warm (/ready answers 503 while warming up)
+echo "Waiting for API warm-up..."
+for i in $(seq 1 600); do
+    if curl -sf http://localhost:8001/ready > /dev/null; then
+        break
+    fi
+    if ! kill -0 $API_PID 2> /dev/null; then
+        echo "API server exited during startup"
+        exit 1
+    fi
+    sleep 0.5
+done
+
+# Don't start the dashboard against an API that never became ready
+if ! curl -sf http://localhost:8001/ready > /dev/null; then
+    echo "API not ready after 300 seconds of warm-up, stopping (see the API log above)"
+    kill $API_PID 2> /dev/null
+    exit 1
+fi
 
 # Start the Streamlit dashboard
 echo "Starting Streamlit dashboard..."
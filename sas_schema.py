@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import re
+
+# Parsed catalogs are cached here, one file per .sas content hash
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+
+# Bump when the parser changes so stale cached catalogs are ignored
+CATALOG_VERSION = 1
+
+# One SAS statement: everything up to the next ';' that is not inside quotes
+STATEMENT_PATTERN = re.compile(r'''((?:"[^"]*"|'[^']*'|[^;"'])*);''')
+COMMENT_PATTERN = re.compile(r'/\*.*?\*/', re.S)
+INPUT_PATTERN = re.compile(r'(\w+)\s+(\$?)\s*(\d+)-(\d+)')
+LABEL_PATTERN = re.compile(r'''(\w+)\s*=\s*(?:"([^"]*)"|'([^']*)')''')
+VALUE_PATTERN = re.compile(r'''(?:"([^"]*)"|'([^']*)'|([^\s="']+))\s*=\s*(?:"([^"]*)"|'([^']*)')''')
+
+_catalogs = {}
+
+def parse_sas_schema(sas_file_path):
+    """
+    Parses the SAS input statement to get variable names and column specifications.
+    Returns: list of dicts with name, start, end, width and type ('char' for $ columns, else 'num')
+    """
+    return parse_sas_catalog(sas_file_path)['variables']
+
+def parse_sas_catalog(sas_file_path):
+    """
+    Parses the whole SAS program: the INPUT statement (variables), LABEL statements
+    (variable labels), PROC FORMAT VALUE blocks and FORMAT statements (value labels).
+    Returns: dict with variables, labels, formats ({format: {code: label}}) and
+    value_formats ({variable: format})
+    """
+    with open(sas_file_path, 'r') as f:
+        text = COMMENT_PATTERN.sub(' ', f.read())
+
+    catalog = {'variables': [], 'labels': {}, 'formats': {}, 'value_formats': {}}
+
+    for match in STATEMENT_PATTERN.finditer(text):
+        words = match.group(1).split(None, 1)
+        if not words:
+            continue
+        keyword = words[0].lower()
+        body = words[1] if len(words) > 1 else ''
+
+        if keyword == 'input':
+            for name, char, start, end in INPUT_PATTERN.findall(body):
+                start, end = int(start), int(end)
+                catalog['variables'].append({
+                    'name': name,
+                    'start': start,
+                    'end': end,
+                    'width': end - start + 1,
+                    'type': 'char' if char else 'num'
+                })
+        elif keyword == 'label':
+            for name, double, single in LABEL_PATTERN.findall(body):
+                catalog['labels'][name] = double or single
+        elif keyword == 'value':
+            name, pairs = (body.split(None, 1) + [''])[:2]
+            catalog['formats'][name.upper()] = {
+                _parse_code(double or single or bare): label_double or label_single
+                for double, single, bare, label_double, label_single in VALUE_PATTERN.findall(pairs)
+            }
+        elif keyword == 'format':
+            pending = []
+            for token in body.split():
+                if token.endswith('.'):
+                    # Format names may carry a width, e.g. $STATE2.
+                    fmt = re.sub(r'\d*\.$', '', token).upper()
+                    for name in pending:
+                        catalog['value_formats'][name] = fmt
+                    pending = []
+                else:
+                    pending.append(token)
+
+    # Without a FORMAT statement, a VALUE block named after the variable applies to it
+    for var in catalog['variables']:
+        name = var['name']
+        prefix = '$' if var['type'] == 'char' else ''
+        for fmt in (prefix + name.upper(), prefix + name.upper() + 'F'):
+            if name not in catalog['value_formats'] and fmt in catalog['formats']:
+                catalog['value_formats'][name] = fmt
+
+    return catalog
+
+def _parse_code(code):
+    try:
+        return int(code)
+    except ValueError:
+        return code
+
+def file_hash(path):
+    digest = hashlib.sha256(f'catalog-v{CATALOG_VERSION}:'.encode())
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_catalog(sas_file_path):
+    """
+    Returns the parsed catalog for a .sas file, parsing it only the first time that
+    exact file content is seen. Catalogs are cached in memory and as compact JSON in
+    CACHE_DIR, keyed by the file's hash; the hash is stored as catalog['sas_hash'].
+    """
+    sas_hash = file_hash(sas_file_path)
+    if sas_hash in _catalogs:
+        return _catalogs[sas_hash]
+
+    cache_file = os.path.join(CACHE_DIR, f'sas_catalog_{sas_hash[:16]}.json')
+    if os.path.exists(cache_file):
+        with open(cache_file, 'r') as f:
+            catalog = catalog_from_json(f.read())
+    else:
+        catalog = parse_sas_catalog(sas_file_path)
+        catalog['sas_hash'] = sas_hash
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(cache_file, 'w') as f:
+            f.write(catalog_to_json(catalog))
+
+    _catalogs[sas_hash] = catalog
+    return catalog
+
+def catalog_to_json(catalog):
+    """Serializes a catalog; format codes are kept as [code, label] pairs so ints stay ints."""
+    data = dict(catalog, formats={
+        name: [[code, label] for code, label in codes.items()]
+        for name, codes in catalog['formats'].items()
+    })
+    return json.dumps(data, separators=(',', ':'))
+
+def catalog_from_json(text):
+    data = json.loads(text)
+    data['formats'] = {name: {code: label for code, label in pairs} for name, pairs in data['formats'].items()}
+    return data
+
+def value_labels(catalog, name):
+    """Returns {code: label} for a variable, or an empty dict if it has no value format."""
+    fmt = catalog['value_formats'].get(name)
+    return catalog['formats'].get(fmt, {})
@@ -0,0 +1,291 @@
+import os
+import json
+import argparse
+import urllib.request
+
+# Source geometry: the us-atlas states at 1:10m, already quantized TopoJSON
+SOURCE_URL = 'https://cdn.jsdelivr.net/npm/us-atlas@3/states-10m.json'
+OUTPUT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'us_states.json')
+
+# State FIPS codes as zero-padded strings, matching the ids of the us-atlas geometries
+STATE_FIPS = {
+    'AL': '01', 'AK': '02', 'AZ': '04', 'AR': '05', 'CA': '06', 'CO': '08', 'CT': '09', 'DE': '10', 'FL': '12', 'GA': '13',
+    'HI': '15', 'ID': '16', 'IL': '17', 'IN': '18', 'IA': '19', 'KS': '20', 'KY': '21', 'LA': '22', 'ME': '23', 'MD': '24',
+    'MA': '25', 'MI': '26', 'MN': '27', 'MS': '28', 'MO': '29', 'MT': '30', 'NE': '31', 'NV': '32', 'NH': '33', 'NJ': '34',
+    'NM': '35', 'NY': '36', 'NC': '37', 'ND': '38', 'OH': '39', 'OK': '40', 'OR': '41', 'PA': '42', 'RI': '44', 'SC': '45',
+    'SD': '46', 'TN': '47', 'TX': '48', 'UT': '49', 'VT': '50', 'VA': '51', 'WA': '53', 'WV': '54', 'WI': '55', 'WY': '56',
+    'DC': '11'
+}
+
+STATE_NAMES = {
+    'AL': 'Alabama', 'AK': 'Alaska', 'AZ': 'Arizona', 'AR': 'Arkansas', 'CA': 'California',
+    'CO': 'Colorado', 'CT': 'Connecticut', 'DE': 'Delaware', 'FL': 'Florida', 'GA': 'Georgia',
+    'HI': 'Hawaii', 'ID': 'Idaho', 'IL': 'Illinois', 'IN': 'Indiana', 'IA': 'Iowa',
+    'KS': 'Kansas', 'KY': 'Kentucky', 'LA': 'Louisiana', 'ME': 'Maine', 'MD': 'Maryland',
+    'MA': 'Massachusetts', 'MI': 'Michigan', 'MN': 'Minnesota', 'MS': 'Mississippi', 'MO': 'Missouri',
+    'MT': 'Montana', 'NE': 'Nebraska', 'NV': 'Nevada', 'NH': 'New Hampshire', 'NJ': 'New Jersey',
+    'NM': 'New Mexico', 'NY': 'New York', 'NC': 'North Carolina', 'ND': 'North Dakota', 'OH': 'Ohio',
+    'OK': 'Oklahoma', 'OR': 'Oregon', 'PA': 'Pennsylvania', 'RI': 'Rhode Island', 'SC': 'South Carolina',
+    'SD': 'South Dakota', 'TN': 'Tennessee', 'TX': 'Texas', 'UT': 'Utah', 'VT': 'Vermont',
+    'VA': 'Virginia', 'WA': 'Washington', 'WV': 'West Virginia', 'WI': 'Wisconsin', 'WY': 'Wyoming',
+    'DC': 'District of Columbia'
+}
+
+# Douglas-Peucker tolerance; about half a screen pixel on the dashboard's 400px-wide maps
+TOLERANCE_DEGREES = 0.05
+
+def decode_arc(arc, delta):
+    """Absolute quantized positions of an arc (delta-encoded when the topology is quantized)"""
+    if not delta:
+        return [list(point[:2]) for point in arc]
+    x = y = 0
+    points = []
+    for dx, dy in arc:
+        x += dx
+        y += dy
+        points.append([x, y])
+    return points
+
+def encode_arc(points, delta):
+    if not delta:
+        return points
+    encoded = []
+    x = y = 0
+    for px, py in points:
+        encoded.append([px - x, py - y])
+        x, y = px, py
+    return encoded
+
+def _distance_sq(point, start, end, scale):
+    """Squared distance from point to the segment start-end, with each axis multiplied by scale"""
+    (sx, sy) = scale
+    (px, py), (ax, ay), (bx, by) = (point[0] * sx, point[1] * sy), (start[0] * sx, start[1] * sy), (end[0] * sx, end[1] * sy)
+    dx, dy = bx - ax, by - ay
+    length_sq = dx * dx + dy * dy
+    t = 0.0 if length_sq == 0 else max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length_sq))
+    cx, cy = ax + t * dx - px, ay + t * dy - py
+    return cx * cx + cy * cy
+
+def simplify_points(points, tolerance, scale=(1.0, 1.0)):
+    """
+    Douglas-Peucker simplification of one arc. Arc endpoints are always kept, so arcs
+    shared by neighbouring states still meet and the topology stays intact.
+    scale: size of one unit along each axis, in the units of tolerance
+    """
+    if len(points) <= 2:
+        return points
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    tolerance_sq = tolerance * tolerance
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        farthest, farthest_sq = None, tolerance_sq
+        for i in range(first + 1, last):
+            d = _distance_sq(points[i], points[first], points[last], scale)
+            if d > farthest_sq:
+                farthest, farthest_sq = i, d
+        if farthest is not None:
+            keep[farthest] = True
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+    simplified = [point for point, kept in zip(points, keep) if kept]
+    # A closed ring (an island) needs at least a triangle to stay a polygon
+    if simplified[0] == simplified[-1] and len(simplified) < 4:
+        return points
+    return simplified
+
+def simplify_topology(topology, tolerance_degrees=TOLERANCE_DEGREES, objects=('states',)):
+    """
+    Copy of a TopoJSON topology with only the given objects, each geometry keeping just
+    its id and name, and every arc simplified to tolerance_degrees.
+    """
+    transform = topology.get('transform')
+    delta = transform is not None
+    # Degrees per quantized grid step, which differs between the two axes
+    scale = tuple(transform['scale']) if delta else (1.0, 1.0)
+
+    arcs = [encode_arc(simplify_points(decode_arc(arc, delta), tolerance_degrees, scale), delta) for arc in topology['arcs']]
+
+    kept_objects = {}
+    for name in objects:
+        obj = topology['objects'][name]
+        kept_objects[name] = {
+            'type': obj['type'],
+            'geometries': [
+                {
+                    'type': g['type'],
+                    'arcs': g['arcs'],
+                    'id': g.get('id'),
+                    'properties': {'name': g.get('properties', {}).get('name')},
+                }
+                for g in obj['geometries']
+            ],
+        }
+
+    simplified = {'type': 'Topology', 'objects': kept_objects, 'arcs': arcs}
+    if delta:
+        simplified['transform'] = transform
+    if 'bbox' in topology:
+        simplified['bbox'] = topology['bbox']
+    return simplified
+
+# Grid a shapefile's coordinates are snapped to before its borders are matched up
+QUANTIZATION = 100000
+
+def read_shapefile_states(source):
+    """
+    (id, name, polygons) for each state and DC in a Census cartographic boundary states
+    shapefile (cb_<year>_us_state_<scale>.shp); polygons are lists of (lon, lat) rings.
+    """
+    try:
+        import shapefile
+    except ImportError:
+        raise SystemExit("Reading a shapefile needs pyshp: pip install pyshp")
+    states = []
+    for shape_record in shapefile.Reader(source).iterShapeRecords():
+        record = shape_record.record.as_dict()
+        if record['STATEFP'] not in STATE_FIPS.values():
+            continue
+        geometry = shape_record.shape.__geo_interface__
+        polygons = geometry['coordinates'] if geometry['type'] == 'MultiPolygon' else [geometry['coordinates']]
+        states.append((record['STATEFP'], record['NAME'], polygons))
+    return states
+
+def _signed_area(ring):
+    return sum(x0 * y1 - x1 * y0 for (x0, y0), (x1, y1) in zip(ring, ring[1:])) / 2
+
+def _extent(ring):
+    xs = [x for x, _ in ring]
+    ys = [y for _, y in ring]
+    return max(max(xs) - min(xs), max(ys) - min(ys))
+
+def build_topology(states, quantization=QUANTIZATION, min_extent_degrees=TOLERANCE_DEGREES):
+    """
+    Quantized TopoJSON topology with a 'states' object, in the us-atlas layout, from
+    (id, name, polygons) tuples. Rings are cut where borders meet, and a border between
+    two states becomes one arc that both reference, so simplification keeps them joined.
+    Exterior rings are wound clockwise and holes anticlockwise, as d3-geo expects.
+    Islands and holes smaller than min_extent_degrees both ways (most of the small
+    islands in the Census files) are left out; simplification would only keep their outline.
+    """
+    states = [
+        (state_id, name, [
+            [polygon[0]] + [hole for hole in polygon[1:] if _extent(hole) >= min_extent_degrees]
+            for polygon in polygons if _extent(polygon[0]) >= min_extent_degrees
+        ])
+        for state_id, name, polygons in states
+    ]
+    xs = [x for _, _, polygons in states for polygon in polygons for ring in polygon for x, _ in ring]
+    ys = [y for _, _, polygons in states for polygon in polygons for ring in polygon for _, y in ring]
+    x0, y0 = min(xs), min(ys)
+    kx = (max(xs) - x0) / (quantization - 1) or 1
+    ky = (max(ys) - y0) / (quantization - 1) or 1
+
+    def quantize(ring, exterior):
+        points = []
+        for x, y in ring:
+            point = (round((x - x0) / kx), round((y - y0) / ky))
+            if not points or point != points[-1]:
+                points.append(point)
+        if points[0] != points[-1]:
+            points.append(points[0])
+        if len(points) < 4:
+            return None
+        if (_signed_area(points) < 0) != exterior:
+            points.reverse()
+        return points
+
+    geometries = []
+    for state_id, name, polygons in states:
+        quantized = []
+        for polygon in polygons:
+            rings = [quantize(ring, i == 0) for i, ring in enumerate(polygon)]
+            if rings[0] is not None:
+                quantized.append([ring for ring in rings if ring is not None])
+        geometries.append((state_id, name, quantized))
+
+    # A junction is a point whose neighbours differ between the rings passing through it
+    neighbours = {}
+    for _, _, polygons in geometries:
+        for polygon in polygons:
+            for ring in polygon:
+                body = ring[:-1]
+                for i, point in enumerate(body):
+                    neighbours.setdefault(point, set()).add(frozenset((body[i - 1], body[(i + 1) % len(body)])))
+    junctions = {point for point, pairs in neighbours.items() if len(pairs) > 1}
+
+    arcs = []
+    arc_ids = {}
+
+    def arc_index(arc):
+        key = tuple(arc)
+        if key in arc_ids:
+            return arc_ids[key]
+        if key[::-1] in arc_ids:
+            return ~arc_ids[key[::-1]]
+        arc_ids[key] = len(arcs)
+        arcs.append(arc)
+        return arc_ids[key]
+
+    def cut(ring):
+        body = ring[:-1]
+        starts = [i for i, point in enumerate(body) if point in junctions]
+        # Without junctions, start at the smallest point so a shared ring is cut the same way twice
+        start = starts[0] if starts else body.index(min(body))
+        body = body[start:] + body[:start] + [body[start]]
+        if not starts:
+            return [arc_index(body)]
+        indexes = []
+        first = 0
+        for i in range(1, len(body)):
+            if body[i] in junctions:
+                indexes.append(arc_index(body[first:i + 1]))
+                first = i
+        return indexes
+
+    objects = []
+    for state_id, name, polygons in geometries:
+        polygon_arcs = [[cut(ring) for ring in polygon] for polygon in polygons]
+        objects.append({
+            'type': 'Polygon' if len(polygon_arcs) == 1 else 'MultiPolygon',
+            'arcs': polygon_arcs[0] if len(polygon_arcs) == 1 else polygon_arcs,
+            'id': state_id,
+            'properties': {'name': name},
+        })
+
+    return {
+        'type': 'Topology',
+        'bbox': [x0, y0, max(xs), max(ys)],
+        'transform': {'scale': [kx, ky], 'translate': [x0, y0]},
+        'objects': {'states': {'type': 'GeometryCollection', 'geometries': objects}},
+        'arcs': [encode_arc([list(point) for point in arc], True) for arc in arcs],
+    }
+
+def load_topology(source, tolerance_degrees=TOLERANCE_DEGREES):
+    if source.endswith('.shp'):
+        return build_topology(read_shapefile_states(source), min_extent_degrees=tolerance_degrees)
+    if os.path.exists(source):
+        with open(source) as f:
+            return json.load(f)
+    with urllib.request.urlopen(source, timeout=60) as resp:
+        return json.load(resp)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the simplified US states TopoJSON bundled with the dashboard")
+    parser.add_argument('--source', default=SOURCE_URL,
+                        help="us-atlas states TopoJSON, as a URL or a local file (default: the jsDelivr copy), "
+                             "or a Census cartographic boundary states shapefile (.shp, needs pyshp)")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE_DEGREES,
+                        help=f"simplification tolerance in degrees (default: {TOLERANCE_DEGREES})")
+    parser.add_argument('--output', default=OUTPUT_FILE, help="where to write the TopoJSON")
+    args = parser.parse_args()
+
+    topology = load_topology(args.source, args.tolerance)
+    simplified = simplify_topology(topology, args.tolerance)
+    with open(args.output, 'w') as f:
+        json.dump(simplified, f, separators=(',', ':'))
+
+    before = sum(len(arc) for arc in topology['arcs'])
+    after = sum(len(arc) for arc in simplified['arcs'])
+    print(f"Wrote {args.output}: {after:,} of {before:,} arc points, {os.path.getsize(args.output):,} bytes")
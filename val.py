@@ -1,82 +1,90 @@
 import pandas as pd
-import re
 import os
 
+from etl import CHUNK_SIZE, read_fixed_width, iter_fixed_width
+from sas_schema import load_catalog
+
 # Paths
 BASE_DIR = '/Users/andyburnett/Library/Mobile Documents/com~apple~CloudDocs/Desktop/X03.27.25/Coding_Practice/projects/nursing_workforce'
 DATA_DIR = os.path.join(BASE_DIR, '2022_NSSRN_PUF_ASCII_Package')
 SAS_FILE = os.path.join(DATA_DIR, 'nssrn_2022_puf_flat.sas')
 TXT_FILE = os.path.join(DATA_DIR, 'nssrn_2022_puf_flat.txt')
 
-def parse_sas_schema(sas_file_path):
-    """
-    Parses the SAS input statement to get variable names and column specifications.
-    Returns: list of dicts with name, start, end
-    """
-    variables = []
-    with open(sas_file_path, 'r') as f:
-        lines = f.readlines()
-        
-    in_input = False
-    pattern = re.compile(r'^\s*(\w+)\s+\$?(\d+)-(\d+)')
-    
-    for line in lines:
-        line = line.strip()
-        if line.lower().startswith('input'):
-            in_input = True
-            continue
-        if line.strip() == ';':
-            in_input = False
-            
-        if in_input:
-            match = pattern.match(line)
-            if match:
-                variables.append({
-                    'name': match.group(1),
-                    'start': int(match.group(2)),
-                    'end': int(match.group(3))
-                })
-    return variables
-
-def get_dataframe(limit=None):
+def get_dataframe(limit=None, columns=None):
     """
     Reads the dataset into a Pandas DataFrame.
     limit: optional integer to limit number of rows (useful for quick testing)
+    columns: optional list of variables to read (default: all of them)
     """
-    variables = parse_sas_schema(SAS_FILE)
+    variables = load_catalog(SAS_FILE)['variables']
     print(f"Schema parsed. Found {len(variables)} variables.")
     
-    colspecs = [(v['start']-1, v['end']) for v in variables]
-    names = [v['name'] for v in variables]
-    missing_values = ['L', 'M', ' ', '.']
-    
     print("Reading data...")
-    df = pd.read_fwf(
-        TXT_FILE,
-        colspecs=colspecs,
-        names=names,
-        na_values=missing_values,
-        nrows=limit
-    )
+    df = read_fixed_width(TXT_FILE, variables, nrows=limit, columns=columns)
     return df
 
+def stream_columns(columns, chunksize=CHUNK_SIZE):
+    """
+    Yields DataFrames of chunksize rows holding only the given variables.
+    Only those byte ranges of the file are parsed, and memory stays constant.
+    """
+    variables = load_catalog(SAS_FILE)['variables']
+    yield from iter_fixed_width(TXT_FILE, variables, columns=columns, chunksize=chunksize)
+
+def count_values(counts, series):
+    """Adds one chunk's value counts (nulls included, keyed as None) into a running dict."""
+    for value, n in series.value_counts(dropna=False).items():
+        key = None if pd.isna(value) else value
+        counts[key] = counts.get(key, 0) + int(n)
+
+def add_group_means(sums, groups, values, weights=None):
+    """
+    Adds one chunk into running per-group [sum(weight * value), sum(weight)] totals.
+    Rows with a null group, value or weight are skipped; weights default to 1.
+    """
+    frame = pd.DataFrame({'group': groups, 'value': values, 'weight': 1.0 if weights is None else weights})
+    frame = frame.dropna()
+    frame['weighted'] = frame['value'] * frame['weight']
+    for group, row in frame.groupby('group')[['weighted', 'weight']].sum().iterrows():
+        total = sums.setdefault(group, [0.0, 0.0])
+        total[0] += row['weighted']
+        total[1] += row['weight']
+
+def finish_means(sums):
+    return pd.Series({group: weighted / weight for group, (weighted, weight) in sorted(sums.items()) if weight})
+
 def run_custom_query():
-    # Load data (remove limit=1000 to process full file)
-    df = get_dataframe(limit=None)  
-    print(f"Data Loaded: {len(df)} rows.")
+    # Declare the columns the queries need; only those are parsed, chunk by chunk
+    columns = ['SEX', 'PN_BURNOUT', 'PN_EARN_PUF', 'RKRNWGTA']
     
-    # --- YOUR QUERIES HERE ---
+    sex_counts = {}
+    burnout_counts = {}
+    earnings = {}
+    weighted_earnings = {}
+    rows = 0
+    
+    for chunk in stream_columns(columns):
+        rows += len(chunk)
+        
+        # --- YOUR QUERIES HERE ---
+        count_values(sex_counts, chunk['SEX'])
+        count_values(burnout_counts, chunk['PN_BURNOUT'])
+        add_group_means(earnings, chunk['SEX'], chunk['PN_EARN_PUF'])
+        add_group_means(weighted_earnings, chunk['SEX'], chunk['PN_EARN_PUF'], chunk['RKRNWGTA'])
+    
+    print(f"Data Streamed: {rows} rows.")
     
     print("\n--- Sex Distribution (1=Male, 2=Female) ---")
-    print(df['SEX'].value_counts(dropna=False))
+    print(pd.Series(sex_counts).sort_values(ascending=False))
     
     print("\n--- Burnout Distribution (1=Yes, 2=No) ---")
-    print(df['PN_BURNOUT'].value_counts(dropna=False))
+    print(pd.Series(burnout_counts).sort_values(ascending=False))
     
     print("\n--- Average Earnings by Gender ---")
-    # Clean earnings for calculation
-    df['PN_EARN_PUF'] = pd.to_numeric(df['PN_EARN_PUF'], errors='coerce')
-    print(df.groupby('SEX')['PN_EARN_PUF'].mean())
+    print(finish_means(earnings))
+    
+    print("\n--- Weighted Average Earnings by Gender (RKRNWGTA) ---")
+    print(finish_means(weighted_earnings))
 
 if __name__ == "__main__":
     run_custom_query()